@@ -0,0 +1,79 @@
+"""
+DatabaseHelper 写入压测：在临时目录的新库里分别用三种方式写入 N 行，输出每秒行数。
+- insert_data        每行一次提交（原来的写法）
+- transaction        with db.transaction(): 里循环 insert_data，最后一次提交
+- insert_many        一个事务 + executemany
+
+    python bench_database_helper.py                        # 1 万行和 100 万行
+    python bench_database_helper.py --rows 50000 --single-limit 50000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from database_helper import DatabaseHelper
+
+
+def make_records(count, start=0):
+    for i in range(start, start + count):
+        yield {
+            "bucketNumber": f"{i % 20 + 1}号桶",
+            "temperature": "18.8",
+            "oxygenLevel": f"{7 + i % 100 / 100:.2f}mg/L",
+            "phLevel": f"{6.5 + i % 50 / 100:.2f}",
+            "testTime": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(1733788800 + i)),
+            "photoPath": "",
+            "photoResult": ""
+        }
+
+
+def bench_single(db, rows):
+    for record in make_records(rows):
+        db.insert_data(record)
+
+
+def bench_transaction(db, rows):
+    with db.transaction():
+        for record in make_records(rows):
+            db.insert_data(record)
+
+
+def bench_many(db, rows):
+    db.insert_many(make_records(rows))
+
+
+METHODS = (("insert_data", bench_single), ("transaction", bench_transaction), ("insert_many", bench_many))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DatabaseHelper 写入压测")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 1000000])
+    parser.add_argument("--single-limit", type=int, default=10000,
+                        help="逐行提交太慢，行数超过这个值时跳过 insert_data")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_db_")
+    try:
+        for rows in args.rows:
+            print(f"📊 {rows} 行")
+            for name, fn in METHODS:
+                if fn is bench_single and rows > args.single_limit:
+                    print(f"  {name:<12} 跳过（超过 --single-limit）")
+                    continue
+                path = os.path.join(tmp, f"{name}_{rows}.db")
+                db = DatabaseHelper(path)
+                start = time.perf_counter()
+                fn(db, rows)
+                elapsed = time.perf_counter() - start
+                count = db.conn.execute("SELECT COUNT(*) FROM data").fetchone()[0]
+                db.close()
+                print(f"  {name:<12} {rows / elapsed:10.0f} 行/秒  用时 {elapsed:7.2f}s  "
+                      f"库大小 {os.path.getsize(path) / 1e6:6.1f}MB  校验 {count}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
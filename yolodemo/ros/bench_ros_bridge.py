@@ -0,0 +1,268 @@
+"""
+ros_socket_server.py 端到端压测。
+在本进程里起一个 mock rosbridge，再用子进程启动桥接服务（站点从临时 JSON 文件读取），
+然后用 N 个 TCP 客户端并发发送 cmd:N，统计：
+- cmd → cmd_ack          客户端发出指令到收到确认
+- cmd → goal 发布         客户端发出指令到 mock 收到 /move_base/goal
+- result → arrived       mock 发出 /move_base/result 到每个客户端收到 arrived
+以及指令吞吐量和 arrived 推送吞吐量。
+move_base 同一时间只执行一个目标，指令间隔小于 goal_delay 时新目标会取代旧目标，
+被取代的目标不再推 arrived（mock 不抢占，只是让结果照常发回来）。
+
+    python bench_ros_bridge.py --clients 50 --commands 20 --goal-delay 0.2
+    python bench_ros_bridge.py --proto msgpack      # 客户端协商成长度前缀 + MessagePack
+    python bench_ros_bridge.py --cbor               # /amcl_pose、/odom、/move_base/feedback 走 CBOR（需要 cbor2）
+    # 压测已经在运行的服务（服务需要连到本脚本的 mock：--rosbridge ws://<本机>:9190）
+    python bench_ros_bridge.py --no-spawn --server 127.0.0.1:5000 --mock-port 9190
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+
+import ros_codec
+from mock_rosbridge import MockRosbridge
+
+ROS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = max(0, math.ceil(p / 100.0 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def report(name, values_sec):
+    ms = [v * 1000 for v in values_sec]
+    if not ms:
+        print(f"  {name:<22} 无数据")
+        return
+    print(f"  {name:<22} n={len(ms):<6} p50={percentile(ms, 50):7.2f}ms  p90={percentile(ms, 90):7.2f}ms  "
+          f"p99={percentile(ms, 99):7.2f}ms  max={max(ms):7.2f}ms")
+
+
+def write_stations_file(count):
+    rows = [{
+        "station_order": i,
+        "station_name": f"{i}号桶",
+        "station_x": float(i % 5),
+        "station_y": float(i // 5),
+        "station_z": 0.0,
+        "station_w": 1.0
+    } for i in range(1, count + 1)]
+    fd, path = tempfile.mkstemp(prefix="bench_stations_", suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False)
+    return path
+
+
+CBOR_TOPICS = ("/amcl_pose", "/odom", "/move_base/feedback")
+
+
+def write_topics_file():
+    topics = {topic: {"compression": "cbor"} for topic in CBOR_TOPICS}
+    fd, path = tempfile.mkstemp(prefix="bench_topics_", suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(topics, f)
+    return path
+
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.ack_latency = []
+        self.goal_latency = []
+        self.arrived_latency = []
+        self.rejected = 0
+        self.errors = 0
+        self.arrived_count = 0
+        # 同一站点的待匹配指令发送时间（先进先出），用来和 mock 收到的目标对应
+        self._pending_goal = defaultdict(deque)
+        self._result_time = {}
+
+    # ---------- mock 钩子 ----------
+
+    def on_goal(self, goal_id, now):
+        station = int(goal_id.split("_")[1])
+        pending = self._pending_goal[station]
+        if pending:
+            self.goal_latency.append(now - pending.popleft())
+
+    def on_result(self, goal_id, now):
+        self._result_time[goal_id] = now
+
+    # ---------- 客户端 ----------
+
+    async def run_client(self, host, port, stations):
+        reader, writer = await asyncio.open_connection(host, port)
+        ack_waiter = None
+        binary = self.args.proto == "msgpack"
+        if binary:
+            await reader.readline()  # 连接时的 station_list 总是 JSON
+            writer.write(b"proto:msgpack\n")
+            while json.loads(await reader.readline()).get("type") != "proto_ack":
+                pass
+
+        async def read_message():
+            if binary:
+                header = await reader.readexactly(4)
+                return ros_codec.loads_frame(await reader.readexactly(int.from_bytes(header, "big")))
+            line = await reader.readline()
+            if not line:
+                raise asyncio.IncompleteReadError(b"", None)
+            return json.loads(line)
+
+        async def read_loop():
+            nonlocal ack_waiter
+            while True:
+                try:
+                    msg = await read_message()
+                except asyncio.IncompleteReadError:
+                    return
+                now = time.perf_counter()
+                kind = msg.get("type")
+                if kind in ("cmd_ack", "cmd_reject", "error") and ack_waiter and not ack_waiter.done():
+                    ack_waiter.set_result((kind, now))
+                elif kind == "arrived":
+                    self.arrived_count += 1
+                    sent = self._result_time.get(msg["data"].get("goal_id"))
+                    if sent is not None:
+                        self.arrived_latency.append(now - sent)
+
+        reader_task = asyncio.create_task(read_loop())
+        try:
+            for _ in range(self.args.commands):
+                station = random.choice(stations)
+                loop = asyncio.get_running_loop()
+                ack_waiter = loop.create_future()
+                start = time.perf_counter()
+                self._pending_goal[station].append(start)
+                if binary:
+                    writer.write(ros_codec.dumps_frame(f"cmd:{station}"))
+                else:
+                    writer.write(f"cmd:{station}\n".encode())
+                kind, now = await asyncio.wait_for(ack_waiter, 10)
+                if kind == "cmd_ack":
+                    self.ack_latency.append(now - start)
+                else:
+                    self._pending_goal[station].remove(start)
+                    if kind == "cmd_reject":
+                        self.rejected += 1
+                    else:
+                        self.errors += 1
+                if self.args.interval:
+                    await asyncio.sleep(self.args.interval)
+        finally:
+            # 留时间接收最后一批 arrived
+            await asyncio.sleep(self.args.goal_delay + 1.0)
+            reader_task.cancel()
+            writer.close()
+
+    async def wait_ready(self, host, port, timeout=15.0):
+        """等服务能接受导航指令（TCP 已监听且 AMCL 已收敛）"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+                await reader.readline()  # station_list
+                writer.write(b"goals\n")
+                await reader.readline()
+                writer.close()
+                await asyncio.sleep(1.0)  # 等 mock 的 AMCL 让服务收敛
+                return True
+            except (ConnectionError, OSError):
+                await asyncio.sleep(0.2)
+        return False
+
+    async def run(self):
+        args = self.args
+        mock = MockRosbridge(amcl_hz=args.amcl_hz, goal_delay=args.goal_delay, preempt=False)
+        mock.on_goal = self.on_goal
+        mock.on_result = self.on_result
+        mock_server = await mock.start("127.0.0.1", args.mock_port)
+        mock_port = mock_server.sockets[0].getsockname()[1]
+
+        proc = None
+        stations_file = None
+        topics_file = None
+        if args.no_spawn:
+            host, port = args.server.rsplit(":", 1)
+            port = int(port)
+        else:
+            host, port = "127.0.0.1", args.port
+            stations_file = write_stations_file(args.stations)
+            cmd = [sys.executable, "ros_socket_server.py", "--rosbridge", f"ws://127.0.0.1:{mock_port}",
+                   "--host", host, "--port", str(port), "--stations-file", stations_file,
+                   "--costs-file", "", "--metrics-port", "0"]
+            if args.cbor:
+                topics_file = write_topics_file()
+                cmd += ["--topics", topics_file]
+            proc = subprocess.Popen(
+                cmd,
+                cwd=ROS_DIR,
+                stdout=None if args.verbose else subprocess.DEVNULL,
+                stderr=None if args.verbose else subprocess.DEVNULL
+            )
+
+        try:
+            if not await self.wait_ready(host, port):
+                print("❌ 桥接服务没有就绪")
+                return
+            stations = list(range(1, args.stations + 1))
+            print(f"🚀 开始压测: {args.clients} 个客户端 × {args.commands} 条指令, "
+                  f"goal_delay={args.goal_delay}s, amcl={args.amcl_hz}Hz, 协议 {args.proto}"
+                  f"{'，rosbridge CBOR' if args.cbor else ''}")
+            start = time.perf_counter()
+            await asyncio.gather(*(self.run_client(host, port, stations) for _ in range(args.clients)))
+            elapsed = time.perf_counter() - start - (args.goal_delay + 1.0)
+        finally:
+            if proc:
+                proc.terminate()
+                proc.wait()
+            for path in (stations_file, topics_file):
+                if path:
+                    os.remove(path)
+            mock.close()
+            mock_server.close()
+            await mock_server.wait_closed()
+
+        total = args.clients * args.commands
+        print("📊 压测结果")
+        report("cmd → cmd_ack", self.ack_latency)
+        report("cmd → goal 发布", self.goal_latency)
+        report("result → arrived", self.arrived_latency)
+        print(f"  指令吞吐量           {len(self.ack_latency) / elapsed:8.1f} 条/秒"
+              f"（共 {total} 条，拒绝 {self.rejected}，错误 {self.errors}）")
+        print(f"  arrived 推送吞吐量   {self.arrived_count / elapsed:8.1f} 条/秒（共 {self.arrived_count} 条）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ros_socket_server 端到端压测")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--commands", type=int, default=20, help="每个客户端发送的指令数")
+    parser.add_argument("--interval", type=float, default=0.0, help="同一客户端两条指令之间的间隔（秒）")
+    parser.add_argument("--stations", type=int, default=10)
+    parser.add_argument("--goal-delay", type=float, default=0.2)
+    parser.add_argument("--amcl-hz", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=5055, help="子进程桥接服务的 TCP 端口")
+    parser.add_argument("--mock-port", type=int, default=0, help="mock rosbridge 端口，0 表示随机")
+    parser.add_argument("--no-spawn", action="store_true", help="不启动子进程，压测 --server 指定的服务")
+    parser.add_argument("--server", default="127.0.0.1:5000")
+    parser.add_argument("--proto", choices=("json", "msgpack"), default="json", help="客户端协议")
+    parser.add_argument("--cbor", action="store_true", help="让桥接服务用 CBOR 订阅高频话题（需要 cbor2）")
+    parser.add_argument("--verbose", action="store_true", help="显示桥接服务的输出")
+    args = parser.parse_args()
+    asyncio.run(Bench(args).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+桥接服务的轻量指标：计数器、仪表、直方图，以 Prometheus 文本格式导出。
+直方图支持采样（每 N 次只测一次，按 N 倍计数），生产环境可以一直开着。
+"""
+import asyncio
+import bisect
+import math
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """
+    仪表：可以直接 set，也可以给一个函数在导出时取值。
+    函数返回数字，或者 {标签值元组: 数字}。
+    """
+
+    def __init__(self, name, help_text, labelnames=(), fn=None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._fn = fn
+        self._values = {}
+
+    def set(self, value, *labelvalues):
+        self._values[labelvalues] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        values = dict(self._values)
+        if self._fn is not None:
+            try:
+                result = self._fn()
+            except Exception as e:
+                print(f"⚠️ 指标 {self.name} 取值失败: {e}")
+                result = {}
+            values.update(result if isinstance(result, dict) else {(): result})
+        for labels, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    直方图。sample_every > 1 时每 N 次调用只记录一次，记录时权重为 N。
+    计时用法：
+        t0 = hist.start()
+        ...
+        hist.stop(t0)
+    没被采样时 start 返回 None，连 perf_counter 都不调用。
+    """
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS, sample_every=1):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.sample_every = max(1, int(sample_every))
+        self._calls = 0
+        self._series = {}  # labels -> [bucket_counts, sum, count]
+        self._lock = threading.Lock()
+
+    def sampled(self):
+        if self.sample_every == 1:
+            return True
+        self._calls += 1
+        return self._calls % self.sample_every == 0
+
+    def start(self):
+        return time.perf_counter() if self.sampled() else None
+
+    def stop(self, started, *labelvalues):
+        if started is not None:
+            self._record(time.perf_counter() - started, labelvalues)
+
+    def observe(self, value, *labelvalues):
+        if self.sampled():
+            self._record(value, labelvalues)
+
+    def _record(self, value, labelvalues):
+        weight = self.sample_every
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += weight
+            series[1] += value * weight
+            series[2] += weight
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = ("le", _format_value(float(bound)))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, sample_every=1):
+        self.sample_every = sample_every
+        self._metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=(), fn=None):
+        return self._add(Gauge(name, help_text, labelnames, fn))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets, self.sample_every))
+
+    def set_sample_every(self, sample_every):
+        self.sample_every = max(1, int(sample_every))
+        for metric in self._metrics:
+            if isinstance(metric, Histogram):
+                metric.sample_every = self.sample_every
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+async def serve_metrics(registry, host="127.0.0.1", port=9100):
+    """极简 HTTP 服务：GET /metrics 返回 Prometheus 文本"""
+
+    async def handle(reader, writer):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+            path = request.split(b" ", 2)[1] if request.count(b" ") >= 2 else b"/"
+            if path.split(b"?")[0] in (b"/metrics", b"/"):
+                body = registry.render().encode("utf-8")
+                status = b"200 OK"
+            else:
+                body = b"not found\n"
+                status = b"404 Not Found"
+            writer.write(b"HTTP/1.1 " + status + b"\r\n"
+                         b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                         b"Connection: close\r\n\r\n" + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"📈 指标接口: http://{host}:{port}/metrics")
+    return server
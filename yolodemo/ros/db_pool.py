@@ -0,0 +1,173 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pymysql
+
+
+class MySQLPool:
+    """
+    线程安全的 pymysql 连接池。
+    - max_size: 最多同时打开的连接数，用满后其它线程排队等待
+    - idle_timeout: 空闲超过这个秒数的连接会被关闭
+    - ping_interval: 空闲超过这个秒数的连接取出前先 ping 一次，坏连接直接丢弃重建
+    """
+
+    def __init__(self, db_config, max_size=4, idle_timeout=300, ping_interval=30, wait_timeout=10):
+        self.db_config = dict(db_config)
+        # 只读查询为主，自动提交避免长事务一直看到旧快照
+        self.db_config.setdefault("autocommit", True)
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self.wait_timeout = wait_timeout
+
+        self._cond = threading.Condition()
+        self._idle = []  # [(conn, last_used)]，后进先出，常用连接保持热
+        self._size = 0  # 已打开的连接总数（空闲 + 借出）
+
+        self._stats = {
+            "created": 0,
+            "closed": 0,
+            "hits": 0,
+            "misses": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "ping_failures": 0,
+            "evicted_idle": 0,
+        }
+
+    # ---------- 对外接口 ----------
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        ok = False
+        try:
+            yield conn
+            ok = True
+        finally:
+            self._release(conn, broken=not ok)
+
+    def query(self, sql, args=None, one=False):
+        with self.connection() as conn:
+            cursor = conn.cursor(pymysql.cursors.DictCursor)
+            try:
+                cursor.execute(sql, args)
+                return cursor.fetchone() if one else cursor.fetchall()
+            finally:
+                cursor.close()
+
+    def stats(self):
+        with self._cond:
+            result = dict(self._stats)
+            result["size"] = self._size
+            result["idle"] = len(self._idle)
+            result["in_use"] = self._size - len(self._idle)
+            result["max_size"] = self.max_size
+        total = result["hits"] + result["misses"]
+        result["hit_rate"] = round(result["hits"] / total, 3) if total else 0.0
+        return result
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close(conn)
+
+    # ---------- 内部实现 ----------
+
+    def _acquire(self):
+        deadline = None
+        wait_start = None
+        with self._cond:
+            while True:
+                self._evict_idle_locked()
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    self._stats["misses"] += 1
+                    conn = None
+                    break
+                if wait_start is None:
+                    wait_start = time.monotonic()
+                    deadline = wait_start + self.wait_timeout
+                    self._stats["waits"] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"数据库连接池已满（{self.max_size}），等待超时")
+                self._cond.wait(remaining)
+
+            if wait_start is not None:
+                waited = time.monotonic() - wait_start
+                self._stats["wait_time_total"] += waited
+                self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+
+        if conn is None:
+            return self._connect()
+
+        if time.monotonic() - last_used > self.ping_interval:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._stats["ping_failures"] += 1
+                self._close(conn)
+                return self._connect()
+
+        with self._cond:
+            self._stats["hits"] += 1
+        return conn
+
+    def _connect(self):
+        try:
+            conn = pymysql.connect(**self.db_config)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def _release(self, conn, broken=False):
+        if broken or not getattr(conn, "open", True):
+            self._close(conn)
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _evict_idle_locked(self):
+        if not self._idle or not self.idle_timeout:
+            return
+        now = time.monotonic()
+        # 列表按归还时间排序，最旧的在最前面
+        expired = 0
+        while expired < len(self._idle) and now - self._idle[expired][1] > self.idle_timeout:
+            expired += 1
+        if not expired:
+            return
+        stale = self._idle[:expired]
+        del self._idle[:expired]
+        self._size -= expired
+        self._stats["evicted_idle"] += expired
+        for conn, _ in stale:
+            self._close(conn)
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._stats["closed"] += 1
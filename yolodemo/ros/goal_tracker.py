@@ -0,0 +1,282 @@
+import itertools
+import math
+import threading
+import time
+from collections import deque
+
+# actionlib_msgs/GoalStatus
+PENDING = 0
+ACTIVE = 1
+PREEMPTED = 2
+SUCCEEDED = 3
+ABORTED = 4
+REJECTED = 5
+PREEMPTING = 6
+RECALLING = 7
+RECALLED = 8
+LOST = 9
+
+STATUS_NAMES = {
+    PENDING: "pending", ACTIVE: "active", PREEMPTED: "preempted", SUCCEEDED: "succeeded",
+    ABORTED: "aborted", REJECTED: "rejected", PREEMPTING: "preempting", RECALLING: "recalling",
+    RECALLED: "recalled", LOST: "lost",
+}
+TERMINAL = {PREEMPTED, SUCCEEDED, ABORTED, REJECTED, RECALLED, LOST}
+FAILED = {ABORTED, REJECTED, LOST}
+
+
+class GoalRecord:
+    def __init__(self, goal_id, station, pose, attempt, tag=None):
+        self.goal_id = goal_id
+        self.station = station
+        self.pose = pose
+        self.attempt = attempt
+        self.tag = tag  # 调用方自己的标记（比如所属巡检路线），重试时沿用
+        self.status = PENDING
+        self.started = time.monotonic()
+        self.canceled = False  # 主动取消的目标被抢占时不重试
+        self.remaining = None  # 剩余直线距离（米）
+        self.speed = None  # 平滑后的接近速度（米/秒）
+        self.eta = None
+        self._last_feedback = None  # (time, remaining)
+        self._last_report = 0.0
+
+    def to_dict(self):
+        return {
+            "goal_id": self.goal_id,
+            "station": self.station,
+            "status": STATUS_NAMES.get(self.status, str(self.status)),
+            "attempt": self.attempt,
+            "elapsed": round(time.monotonic() - self.started, 1),
+            "remaining": None if self.remaining is None else round(self.remaining, 2),
+            "eta": None if self.eta is None else round(self.eta, 1),
+        }
+
+
+class GoalTracker:
+    """
+    导航目标生命周期跟踪。
+    - 所有在途目标按 goal_id 建字典，/move_base/status 每个条目 O(1) 查找，状态没变就跳过
+    - 每个目标单独超时：超时先按 id 取消，再按 max_retries 重发
+    - /move_base/feedback 计算剩余距离和 ETA，限频推给客户端
+    rosbridge 线程和事件循环线程都会调用，内部加锁。
+    """
+
+    def __init__(self, scheduler, publish_goal, cancel_goal, notify, on_succeeded=None, on_abandoned=None,
+                 timeout=180.0, max_retries=1, progress_interval=1.0, name=""):
+        self._scheduler = scheduler
+        self.name = name  # 多台小车共用一个调度器时区分定时任务
+        self._publish_goal = publish_goal  # (pose, station, goal_id)
+        self._cancel_goal = cancel_goal  # (goal_id)
+        self._notify = notify
+        self._on_succeeded = on_succeeded  # (record)
+        self._on_abandoned = on_abandoned  # (record, reason)，目标被取消或重试后仍失败
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.progress_interval = progress_interval
+
+        self._lock = threading.Lock()
+        self._goals = {}  # goal_id -> GoalRecord（在途）
+        self._history = deque(maxlen=50)  # 最近结束的目标
+        self._resync_before = None  # 重连后要核对的目标：在这个时间之前发出的
+        self._seq = itertools.count(1)
+
+    # ---------- 发起 / 取消 ----------
+
+    def start(self, station, pose, attempt=1, tag=None):
+        goal_id = f"goal_{station}_{int(time.time())}_{next(self._seq)}"
+        record = GoalRecord(goal_id, station, pose, attempt, tag)
+        with self._lock:
+            # move_base 同一时间只执行一个目标，旧目标会被抢占：直接结束，不再超时重试或重连补发
+            replaced = list(self._goals.values())
+            self._goals.clear()
+            for old in replaced:
+                old.canceled = True
+                self._history.append(old.to_dict())
+            self._goals[goal_id] = record
+        for old in replaced:
+            self._scheduler.cancel(("goal_timeout", self.name, old.goal_id))
+            self._notify({
+                "type": "goal_canceled",
+                "data": old.to_dict(),
+                "msg": "被新的导航目标取代",
+                "success": False
+            })
+            if self._on_abandoned:
+                self._on_abandoned(old, "被新的导航目标取代")
+        self._scheduler.call_later(self.timeout, self._on_timeout, goal_id, key=("goal_timeout", self.name, goal_id))
+        self._publish_goal(pose, station, goal_id)
+        return record
+
+    def cancel_all(self, reason="已取消导航"):
+        with self._lock:
+            records = list(self._goals.values())
+            self._goals.clear()
+            for record in records:
+                record.canceled = True
+                self._history.append(record.to_dict())
+        for record in records:
+            self._scheduler.cancel(("goal_timeout", self.name, record.goal_id))
+            self._cancel_goal(record.goal_id)
+            self._notify({
+                "type": "goal_canceled",
+                "data": record.to_dict(),
+                "msg": reason,
+                "success": False
+            })
+            if self._on_abandoned:
+                self._on_abandoned(record, reason)
+        if records:
+            print(f"🚫 {reason}: {[r.goal_id for r in records]}")
+        return len(records)
+
+    def resync(self, before):
+        """
+        rosbridge 重连后调用。下一条 /move_base/status 里没有的在途目标
+        （在 before 之前发出，move_base 不知道了，比如小车端重启过）会按原 goal_id 重新发布。
+        """
+        with self._lock:
+            self._resync_before = before
+
+    def active_goals(self):
+        with self._lock:
+            return [r.to_dict() for r in self._goals.values()]
+
+    def recent_goals(self):
+        with self._lock:
+            return list(self._history)
+
+    # ---------- rosbridge 消息 ----------
+
+    def on_status_array(self, msg):
+        """/move_base/status (actionlib_msgs/GoalStatusArray)"""
+        if self._resync_before is not None:
+            self._republish_missing(msg)
+        for status in msg.get("status_list", ()):
+            self._apply_status(status.get("goal_id", {}).get("id", ""), status.get("status", -1),
+                               status.get("text", ""))
+
+    def on_result(self, msg):
+        """/move_base/result (move_base_msgs/MoveBaseActionResult)"""
+        status = msg.get("status", {})
+        self._apply_status(status.get("goal_id", {}).get("id", ""), status.get("status", -1),
+                           status.get("text", ""))
+
+    def on_feedback(self, msg):
+        """/move_base/feedback (move_base_msgs/MoveBaseActionFeedback)"""
+        goal_id = msg.get("status", {}).get("goal_id", {}).get("id", "")
+        record = self._goals.get(goal_id)
+        if record is None:
+            return
+        pos = msg["feedback"]["base_position"]["pose"]["position"]
+        target = record.pose["position"]
+        remaining = math.hypot(target["x"] - pos["x"], target["y"] - pos["y"])
+        now = time.monotonic()
+
+        with self._lock:
+            if record._last_feedback is not None:
+                last_time, last_remaining = record._last_feedback
+                dt = now - last_time
+                if dt > 0:
+                    speed = max(0.0, (last_remaining - remaining) / dt)
+                    record.speed = speed if record.speed is None else 0.8 * record.speed + 0.2 * speed
+            record._last_feedback = (now, remaining)
+            record.remaining = remaining
+            record.eta = remaining / record.speed if record.speed and record.speed > 0.01 else None
+            if now - record._last_report < self.progress_interval:
+                return
+            record._last_report = now
+            data = record.to_dict()
+
+        self._notify({
+            "type": "goal_progress",
+            "data": data,
+            "msg": "导航中",
+            "success": True
+        })
+
+    def _republish_missing(self, msg):
+        known = {status.get("goal_id", {}).get("id", "") for status in msg.get("status_list", ())}
+        with self._lock:
+            before, self._resync_before = self._resync_before, None
+            missing = [r for r in self._goals.values()
+                       if r.goal_id not in known and r.started < before and not r.canceled]
+        for record in missing:
+            print(f"🔁 move_base 没有目标 {record.goal_id}，重新发布")
+            self._publish_goal(record.pose, record.station, record.goal_id)
+
+    # ---------- 状态处理 ----------
+
+    def _apply_status(self, goal_id, code, text=""):
+        with self._lock:
+            record = self._goals.get(goal_id)
+            if record is None or record.status == code:
+                return
+            record.status = code
+            if code not in TERMINAL:
+                return
+            del self._goals[goal_id]
+            if code == SUCCEEDED:
+                record.remaining = 0.0
+                record.eta = 0.0
+            data = record.to_dict()
+            self._history.append(data)
+
+        self._scheduler.cancel(("goal_timeout", self.name, goal_id))
+        name = STATUS_NAMES.get(code, str(code))
+
+        if code == SUCCEEDED:
+            print(f"🎯 到站成功: {record.station} 号站 ({goal_id})，用时 {data['elapsed']} 秒")
+            self._notify({
+                "type": "arrived",
+                "data": data,
+                "msg": "已到达目标站点",
+                "success": True
+            })
+            if self._on_succeeded:
+                self._on_succeeded(record)
+        elif code in FAILED and not record.canceled:
+            print(f"⚠️ 导航失败 ({name}): {goal_id} {text}")
+            self._retry_or_fail(record, f"导航失败（{name}）")
+        else:
+            print(f"🚫 导航目标已取消 ({name}): {goal_id}")
+            self._notify({
+                "type": "goal_canceled",
+                "data": data,
+                "msg": "导航目标已取消",
+                "success": False
+            })
+            if self._on_abandoned:
+                self._on_abandoned(record, "导航目标已取消")
+
+    def _on_timeout(self, goal_id):
+        with self._lock:
+            record = self._goals.pop(goal_id, None)
+            if record is None:
+                return
+            record.canceled = True
+            data = record.to_dict()
+            self._history.append(data)
+        print(f"⏰ 导航超时（{self.timeout:.0f} 秒）: {goal_id}")
+        self._cancel_goal(goal_id)
+        self._retry_or_fail(record, "导航超时")
+
+    def _retry_or_fail(self, record, reason):
+        if record.attempt <= self.max_retries:
+            print(f"🔁 {reason}，第 {record.attempt} 次重试 {record.station} 号站")
+            new_record = self.start(record.station, record.pose, record.attempt + 1, record.tag)
+            self._notify({
+                "type": "goal_retry",
+                "data": new_record.to_dict(),
+                "msg": f"{reason}，正在重试",
+                "success": False
+            })
+            return
+        self._notify({
+            "type": "goal_failed",
+            "data": record.to_dict(),
+            "msg": reason,
+            "success": False
+        })
+        if self._on_abandoned:
+            self._on_abandoned(record, reason)
@@ -0,0 +1,121 @@
+class LineFramer:
+    """
+    增量换行分帧器：TCP 收到多少就喂多少，按 \\n 切出完整的一行。
+    - 一次收到多条（cmd:3\\ncmd:4\\n）按顺序全部返回
+    - 一条指令被拆成多个 TCP 段时先缓存，等换行到了再返回
+    - 已经扫描过的字节不会重复扫描，缓冲区每次 feed 只整理一次
+    - 超过 max_line 的行返回 None，并丢弃到下一个换行为止
+    """
+
+    def __init__(self, max_line=4096):
+        self.max_line = max_line
+        self._buf = bytearray()
+        self._scan = 0  # 从这里继续找换行
+        self._discarding = False  # 正在丢弃一条超长行的剩余部分
+
+    def feed(self, data):
+        buf = self._buf
+        buf += data
+        lines = []
+        start = 0
+
+        while True:
+            nl = buf.find(b"\n", self._scan)
+            if nl < 0:
+                break
+            if self._discarding:
+                # 超长行的结尾，已经报告过了
+                self._discarding = False
+            else:
+                end = nl
+                if end > start and buf[end - 1] == 0x0D:
+                    end -= 1
+                if end - start > self.max_line:
+                    lines.append(None)
+                else:
+                    lines.append(bytes(buf[start:end]))
+            start = nl + 1
+            self._scan = start
+
+        partial = len(buf) - start
+        if partial and buf[-1] == 0x0D:
+            partial -= 1  # \r\n 可能被拆在两次读里，\r 不算行长，和一次读到时的限制一致
+        if not self._discarding and partial > self.max_line:
+            lines.append(None)
+            self._discarding = True
+
+        if self._discarding:
+            # 超长行不需要保留内容
+            del buf[:]
+            self._scan = 0
+        else:
+            del buf[:start]
+            self._scan = len(buf)
+        return lines
+
+    @property
+    def pending(self):
+        """缓冲区里还没凑成整行的字节数"""
+        return len(self._buf)
+
+    def take_pending(self):
+        """切换协议时取走还没凑成整行的字节，交给新的分帧器"""
+        data = b"" if self._discarding else bytes(self._buf)
+        del self._buf[:]
+        self._scan = 0
+        self._discarding = False
+        return data
+
+
+class LengthPrefixFramer:
+    """
+    长度前缀分帧器：每帧是 4 字节大端长度 + 内容，用法和 LineFramer 一样。
+    - 超过 max_frame 的帧返回 None，内容按长度跳过，不会失去同步
+    """
+
+    HEADER = 4
+
+    def __init__(self, max_frame=65536):
+        self.max_frame = max_frame
+        self._buf = bytearray()
+        self._skip = 0  # 超长帧还没跳过的字节数
+
+    def feed(self, data):
+        buf = self._buf
+        buf += data
+        frames = []
+        start = 0
+
+        while True:
+            if self._skip:
+                n = min(self._skip, len(buf) - start)
+                self._skip -= n
+                start += n
+                if self._skip:
+                    break
+            if len(buf) - start < self.HEADER:
+                break
+            length = int.from_bytes(buf[start:start + self.HEADER], "big")
+            if length > self.max_frame:
+                frames.append(None)
+                start += self.HEADER
+                self._skip = length
+                continue
+            end = start + self.HEADER + length
+            if end > len(buf):
+                break
+            frames.append(bytes(buf[start + self.HEADER:end]))
+            start = end
+
+        del buf[:start]
+        return frames
+
+    @property
+    def pending(self):
+        return len(self._buf)
+
+    def take_pending(self):
+        data = bytes(self._buf)
+        del self._buf[:]
+        self._skip = 0
+        return data
@@ -205,6 +205,7 @@ class MainWindow(QWidget):
         except Exception as e:
             self.signals.log.emit(f"❌ 采集失败：{str(e)}")
         finally:
+            self.db.close()  # 每次采集一个新线程，用完就关掉它的连接
             self.signals.enable_btn.emit()
 
     def on_photo_ready(self, path):
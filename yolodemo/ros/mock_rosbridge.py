@@ -0,0 +1,380 @@
+"""
+本地 rosbridge 替身：没有真车时用来调试和压测 ros_socket_server.py。
+只用标准库实现 WebSocket 服务端，支持 advertise / subscribe / unsubscribe / publish / call_service，
+- 按设定频率发布 /amcl_pose、/odom（/cmd_vel 的角速度会积分进航向），订阅里的 throttle_rate 生效
+- 收到 /move_base/goal 后按 goal_delay 秒完成，发布 /move_base/result，期间发布 status / feedback
+- 订阅带 compression: cbor 且装了 cbor2 时以二进制 CBOR 帧下发（浮点数组用 RFC 8746 typed array，
+  和 rosbridge 一致），其余以 JSON 文本下发，不做 png 压缩
+
+    python mock_rosbridge.py --port 9090 --amcl-hz 10 --goal-delay 3
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import struct
+import time
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONT = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+def _cbor_typed(obj):
+    """把浮点数组换成 float64 小端 typed array（标签 86），和 rosbridge 的 cbor 压缩一样"""
+    if isinstance(obj, dict):
+        return {k: _cbor_typed(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        if obj and all(isinstance(v, float) for v in obj):
+            return cbor2.CBORTag(86, struct.pack(f"<{len(obj)}d", *obj))
+        return [_cbor_typed(v) for v in obj]
+    return obj
+
+
+class WsConnection:
+    """最小的 WebSocket 服务端连接（RFC 6455）"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.addr = writer.get_extra_info("peername")
+        self.closed = False
+
+    async def handshake(self):
+        request = await self.reader.readuntil(b"\r\n\r\n")
+        headers = {}
+        for line in request.decode("latin-1").split("\r\n")[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if not key:
+            self.writer.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        return True
+
+    async def recv(self):
+        """返回 (opcode, payload)；连接关闭时返回 None。分片帧会拼好再返回"""
+        message_op = None
+        parts = []
+        while True:
+            head = await self.reader.readexactly(2)
+            fin = head[0] & 0x80
+            opcode = head[0] & 0x0F
+            length = head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack(">H", await self.reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack(">Q", await self.reader.readexactly(8))[0]
+            mask = await self.reader.readexactly(4) if head[1] & 0x80 else None
+            payload = await self.reader.readexactly(length)
+            if mask and length:
+                key = (mask * (length // 4 + 1))[:length]
+                payload = (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(length, "big")
+
+            if opcode == OP_CLOSE:
+                self.send_frame(OP_CLOSE, payload[:2])
+                return None
+            if opcode == OP_PING:
+                self.send_frame(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode != OP_CONT:
+                message_op = opcode
+            parts.append(payload)
+            if fin:
+                return message_op, b"".join(parts)
+
+    def send_frame(self, opcode, payload):
+        if self.closed:
+            return
+        length = len(payload)
+        if length < 126:
+            header = struct.pack(">BB", 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack(">BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+        self.writer.write(header + payload)
+
+    def send_json(self, obj):
+        self.send_frame(OP_TEXT, json.dumps(obj, separators=(",", ":")).encode("utf-8"))
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.writer.close()
+
+
+class MockRosbridge:
+    def __init__(self, amcl_hz=10.0, odom_hz=20.0, goal_delay=3.0, goal_status=3, preempt=True,
+                 covariance=0.05):
+        self.amcl_hz = amcl_hz
+        self.odom_hz = odom_hz
+        self.goal_delay = goal_delay
+        self.goal_status = goal_status  # 目标结束时给的状态码，3 = SUCCEEDED，4 = ABORTED
+        self.preempt = preempt  # 新目标是否抢占旧目标（真实 move_base 的行为）
+        self.covariance = covariance
+
+        self.connections = set()
+        self._subs = {}  # conn -> {topic: [throttle_sec, last_sent, cbor]}
+        self.advertised = set()
+        self.goals = {}  # goal_id -> {"target", "published", "handle"}
+        self.pose = [0.0, 0.0, 0.0]  # x, y, yaw
+        self.angular_z = 0.0
+        self.counters = {}
+
+        # 压测钩子：收到目标 / 发出结果时回调 (goal_id, time.perf_counter())
+        self.on_goal = None
+        self.on_result = None
+        self._tasks = []
+
+    # ---------- 服务端 ----------
+
+    async def start(self, host="0.0.0.0", port=9090):
+        server = await asyncio.start_server(self._handle, host, port)
+        loop = asyncio.get_running_loop()
+        self._tasks = [
+            loop.create_task(self._periodic(self.amcl_hz, self._publish_amcl)),
+            loop.create_task(self._periodic(self.odom_hz, self._publish_odom)),
+            loop.create_task(self._periodic(5.0, self._publish_status)),
+            loop.create_task(self._periodic(2.0, self._publish_feedback)),
+        ]
+        return server
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        for conn in list(self.connections):
+            conn.close()
+
+    async def _handle(self, reader, writer):
+        conn = WsConnection(reader, writer)
+        try:
+            if not await conn.handshake():
+                return
+            self.connections.add(conn)
+            self._subs[conn] = {}
+            print(f"✅ mock rosbridge 客户端连接: {conn.addr}")
+            while True:
+                frame = await conn.recv()
+                if frame is None:
+                    break
+                opcode, payload = frame
+                if opcode == OP_TEXT:
+                    self._handle_op(conn, json.loads(payload))
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.connections.discard(conn)
+            self._subs.pop(conn, None)
+            conn.close()
+            print(f"❎ mock rosbridge 客户端断开: {conn.addr}")
+
+    def _count(self, name):
+        self.counters[name] = self.counters.get(name, 0) + 1
+
+    def _handle_op(self, conn, msg):
+        op = msg.get("op")
+        topic = msg.get("topic")
+        self._count(f"{op}:{topic or msg.get('service', '')}")
+
+        if op == "subscribe":
+            throttle = msg.get("throttle_rate", 0) / 1000.0
+            use_cbor = msg.get("compression") == "cbor" and cbor2 is not None
+            self._subs[conn][topic] = [throttle, 0.0, use_cbor]
+        elif op == "unsubscribe":
+            self._subs[conn].pop(topic, None)
+        elif op == "advertise":
+            self.advertised.add(topic)
+        elif op == "publish":
+            if topic == "/move_base/goal":
+                self._on_goal(msg["msg"])
+            elif topic == "/move_base/cancel":
+                self._on_cancel(msg["msg"].get("id", ""))
+            elif topic == "/cmd_vel":
+                self.angular_z = msg["msg"]["angular"]["z"]
+        elif op == "call_service":
+            values = {}
+            if msg.get("service", "").endswith("make_plan"):
+                values = self._make_plan(msg.get("args", {}))
+            conn.send_json({
+                "op": "service_response",
+                "service": msg.get("service"),
+                "id": msg.get("id"),
+                "values": values,
+                "result": True
+            })
+
+    @staticmethod
+    def _make_plan(args):
+        """先走 x 再走 y 的折线路径，长度和直线距离不同，方便看出代价来自规划"""
+        start = args["start"]["pose"]["position"]
+        goal = args["goal"]["pose"]["position"]
+        points = [(start["x"], start["y"]), (goal["x"], start["y"]), (goal["x"], goal["y"])]
+        return {"plan": {"header": {"frame_id": "map"}, "poses": [
+            {"pose": {"position": {"x": x, "y": y, "z": 0.0}}} for x, y in points
+        ]}}
+
+    def publish(self, topic, msg):
+        now = time.monotonic()
+        frames = {}  # 同一条消息按编码只序列化一次
+        for conn, topics in list(self._subs.items()):
+            sub = topics.get(topic)
+            if sub is None or now - sub[1] < sub[0]:
+                continue
+            sub[1] = now
+            use_cbor = sub[2]
+            if use_cbor not in frames:
+                op = {"op": "publish", "topic": topic, "msg": msg}
+                if use_cbor:
+                    frames[use_cbor] = (OP_BINARY, cbor2.dumps(_cbor_typed(op)))
+                else:
+                    frames[use_cbor] = (OP_TEXT, json.dumps(op, separators=(",", ":")).encode("utf-8"))
+            conn.send_frame(*frames[use_cbor])
+
+    # ---------- 导航目标 ----------
+
+    def _on_goal(self, goal_msg):
+        goal_id = goal_msg["goal_id"]["id"]
+        if self.on_goal:
+            self.on_goal(goal_id, time.perf_counter())
+        if self.preempt:
+            for old_id in list(self.goals):
+                self._finish_goal(old_id, 2)
+        target = goal_msg["goal"]["target_pose"]["pose"]["position"]
+        handle = asyncio.get_running_loop().call_later(self.goal_delay, self._finish_goal, goal_id,
+                                                       self.goal_status)
+        self.goals[goal_id] = {"target": target, "start": list(self.pose), "published": time.monotonic(),
+                               "handle": handle}
+
+    def _on_cancel(self, goal_id):
+        ids = list(self.goals) if not goal_id else [goal_id]
+        for gid in ids:
+            if gid in self.goals:
+                self._finish_goal(gid, 2)
+
+    def _finish_goal(self, goal_id, status):
+        goal = self.goals.pop(goal_id, None)
+        if goal is None:
+            return
+        goal["handle"].cancel()
+        if status == 3:
+            self.pose[0] = goal["target"]["x"]
+            self.pose[1] = goal["target"]["y"]
+        if self.on_result:
+            self.on_result(goal_id, time.perf_counter())
+        self.publish("/move_base/result", {
+            "status": {"goal_id": {"id": goal_id}, "status": status, "text": ""},
+            "result": {}
+        })
+
+    # ---------- 周期发布 ----------
+
+    async def _periodic(self, hz, fn):
+        if hz <= 0:
+            return
+        interval = 1.0 / hz
+        while True:
+            fn()
+            await asyncio.sleep(interval)
+
+    def _orientation(self):
+        yaw = self.pose[2]
+        return {"x": 0.0, "y": 0.0, "z": math.sin(yaw / 2), "w": math.cos(yaw / 2)}
+
+    def _goal_position(self, goal, now):
+        # 从起点到目标线性插值
+        ratio = min(1.0, (now - goal["published"]) / self.goal_delay) if self.goal_delay else 1.0
+        x = goal["start"][0] + (goal["target"]["x"] - goal["start"][0]) * ratio
+        y = goal["start"][1] + (goal["target"]["y"] - goal["start"][1]) * ratio
+        return x, y
+
+    def _publish_amcl(self):
+        if self.goals:
+            # 导航途中位置跟着 feedback 走，客户端的实时位姿才有变化
+            self.pose[0], self.pose[1] = self._goal_position(next(iter(self.goals.values())), time.monotonic())
+        cov = [0.0] * 36
+        cov[0] = cov[7] = self.covariance
+        self.publish("/amcl_pose", {
+            "header": {"frame_id": "map"},
+            "pose": {
+                "pose": {
+                    "position": {"x": self.pose[0], "y": self.pose[1], "z": 0.0},
+                    "orientation": self._orientation()
+                },
+                "covariance": cov
+            }
+        })
+
+    def _publish_odom(self):
+        if self.odom_hz > 0:
+            self.pose[2] = math.atan2(math.sin(self.pose[2] + self.angular_z / self.odom_hz),
+                                      math.cos(self.pose[2] + self.angular_z / self.odom_hz))
+        self.publish("/odom", {
+            "header": {"frame_id": "odom"},
+            "pose": {"pose": {"position": {"x": self.pose[0], "y": self.pose[1], "z": 0.0},
+                              "orientation": self._orientation()}},
+            "twist": {"twist": {"angular": {"x": 0.0, "y": 0.0, "z": self.angular_z}}}
+        })
+
+    def _publish_status(self):
+        self.publish("/move_base/status", {
+            "status_list": [{"goal_id": {"id": gid}, "status": 1, "text": ""} for gid in self.goals]
+        })
+
+    def _publish_feedback(self):
+        now = time.monotonic()
+        for gid, goal in self.goals.items():
+            x, y = self._goal_position(goal, now)
+            self.publish("/move_base/feedback", {
+                "status": {"goal_id": {"id": gid}, "status": 1},
+                "feedback": {"base_position": {"pose": {"position": {"x": x, "y": y, "z": 0.0}}}}
+            })
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="本地 rosbridge 替身")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--amcl-hz", type=float, default=10.0)
+    parser.add_argument("--odom-hz", type=float, default=20.0)
+    parser.add_argument("--goal-delay", type=float, default=3.0, help="导航目标多少秒后完成")
+    parser.add_argument("--goal-status", type=int, default=3, help="目标结束状态码（3 成功 / 4 失败）")
+    parser.add_argument("--no-preempt", action="store_true", help="新目标不抢占旧目标")
+    parser.add_argument("--covariance", type=float, default=0.05, help="AMCL 协方差（>=0.4 视为发散）")
+    args = parser.parse_args()
+
+    mock = MockRosbridge(args.amcl_hz, args.odom_hz, args.goal_delay, args.goal_status,
+                         not args.no_preempt, args.covariance)
+    server = await mock.start(args.host, args.port)
+    print(f"🚀 mock rosbridge 启动: ws://{args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("🛑 手动中断")
@@ -0,0 +1,101 @@
+import time
+from collections import deque
+
+# 队列满了以后的处理方式
+DROP_OLDEST = "drop_oldest"  # 丢掉最早的一条，保证最新状态能送达
+DROP_NEWEST = "drop_newest"  # 丢掉新来的这条
+DISCONNECT = "disconnect"  # 客户端跟不上，直接断开
+
+
+class OutboundQueue:
+    """
+    单个客户端的有界发送队列（不加锁，只在事件循环线程里用）。
+    put 时可以带一个 key：同一个 key 还没发出去的旧消息会被新消息原地替换，
+    比如 amcl 状态只需要最新的一条。
+    """
+
+    def __init__(self, maxsize=256, policy=DROP_OLDEST):
+        self.maxsize = maxsize
+        self.policy = policy
+        self._items = deque()  # [key, data, 入队时间]
+        self._latest = {}  # key -> 队列里对应的那一项
+
+        self.enqueued = 0
+        self.sent = 0
+        self.sent_bytes = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.last_batch_enqueued = None  # 最近一批里最早入队的时间（perf_counter）
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, data, key=None):
+        """放入一条消息；策略为 disconnect 且队列已满时返回 False"""
+        self.enqueued += 1
+        if key is not None:
+            item = self._latest.get(key)
+            if item is not None:
+                item[1] = data
+                self.coalesced += 1
+                return True
+
+        if len(self._items) >= self.maxsize:
+            if self.policy == DISCONNECT:
+                self.dropped += 1
+                return False
+            if self.policy == DROP_NEWEST:
+                self.dropped += 1
+                return True
+            old = self._items.popleft()
+            if old[0] is not None and self._latest.get(old[0]) is old:
+                del self._latest[old[0]]
+            self.dropped += 1
+
+        item = [key, data, time.perf_counter()]
+        self._items.append(item)
+        if key is not None:
+            self._latest[key] = item
+        if len(self._items) > self.max_depth:
+            self.max_depth = len(self._items)
+        return True
+
+    def barrier(self, key=None):
+        """
+        之后放入的消息不再替换之前排队的同 key 消息；不给 key 时对所有 key 生效。
+        比如客户端切换协议后两种编码不能互相替换，位姿关键帧不能被后面的增量替换。
+        """
+        if key is None:
+            self._latest.clear()
+        else:
+            self._latest.pop(key, None)
+
+    def pop_batch(self, max_bytes=262144):
+        """取出一批待发送的数据，总长度大约不超过 max_bytes（至少一条）"""
+        batch = []
+        size = 0
+        items = self._items
+        self.last_batch_enqueued = items[0][2] if items else None
+        while items and (not batch or size + len(items[0][1]) <= max_bytes):
+            item = items.popleft()
+            key, data = item[0], item[1]
+            if key is not None and self._latest.get(key) is item:
+                del self._latest[key]
+            batch.append(data)
+            size += len(data)
+        self.sent += len(batch)
+        self.sent_bytes += size
+        return batch
+
+    def stats(self):
+        return {
+            "depth": len(self._items),
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "sent_bytes": self.sent_bytes,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "policy": self.policy,
+        }
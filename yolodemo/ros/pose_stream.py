@@ -0,0 +1,96 @@
+"""
+给客户端推送小车实时位姿（/amcl_pose 的 x、y、航向）。
+每个订阅的客户端一个 PoseSubscription，自己决定频率和阈值：
+- 两次推送间隔不小于 1/hz；位移小于 min_dist 且转角小于 min_yaw 时不推
+- 关键帧带完整位姿，其余是相对最近一个关键帧的整数增量（毫米 / 毫弧度），
+  所以排队中的增量可以被更新的增量直接替换（合并 key "robot_pose"），不会累积误差
+
+    关键帧  {"seq": 7, "key": true, "x": 1.234, "y": -0.5, "yaw": 1.571}
+    增量    {"seq": 8, "ref": 7, "dx": 52, "dy": -3, "dyaw": 10}
+            x = 1.234 + 52 / 1000，yaw 相加后自行归一化到 [-π, π]
+客户端发现 ref 不是自己收到的最后一个关键帧（被队列丢弃了）时，等下一个关键帧即可。
+"""
+import math
+
+POSE_SCALE = 1000  # 增量单位：毫米 / 毫弧度
+
+
+def _wrap(angle):
+    return math.atan2(math.sin(angle), math.cos(angle))
+
+
+class PoseSubscription:
+    def __init__(self, hz, min_dist=0.05, min_yaw=math.radians(2), keyframe_every=20):
+        self.hz = hz
+        self.min_dist = min_dist
+        self.min_yaw = min_yaw
+        self.keyframe_every = keyframe_every
+        self.seq = 0
+        self.sent = 0
+        self.skipped = 0  # 没动够阈值被跳过的次数
+        self._key = None  # 最近一个关键帧 (seq, qx, qy, qyaw)
+        self._since_key = 0
+        self._last_pose = None  # 最近一次推送的 (x, y, yaw)
+        self._last_time = None
+
+    @property
+    def interval(self):
+        return 1.0 / self.hz
+
+    def reset(self):
+        """下一次一定推关键帧（刚订阅、切换小车）"""
+        self._key = None
+        self._last_pose = None
+
+    def wait_time(self, now):
+        """距离下一次允许推送还要等多少秒，0 表示现在就可以"""
+        if self._last_time is None:
+            return 0.0
+        return max(0.0, self._last_time + self.interval - now)
+
+    def moved(self, pose):
+        if self._last_pose is None:
+            return True
+        x, y, yaw = pose
+        last_x, last_y, last_yaw = self._last_pose
+        return (math.hypot(x - last_x, y - last_y) >= self.min_dist
+                or abs(_wrap(yaw - last_yaw)) >= self.min_yaw)
+
+    def update(self, pose, now):
+        """
+        位姿有更新时调用。返回 (data, keyframe)：data 为 None 表示这次不推。
+        频率限制挡住时不丢，调用方应在 wait_time 之后再调一次。
+        """
+        if not self.moved(pose):
+            self.skipped += 1
+            return None, False
+        if self.wait_time(now) > 0:
+            return None, False
+        x, y, yaw = pose
+        yaw = _wrap(yaw)
+        q = (round(x * POSE_SCALE), round(y * POSE_SCALE), round(yaw * POSE_SCALE))
+        self.seq += 1
+        keyframe = self._key is None or self._since_key >= self.keyframe_every
+        if keyframe:
+            self._key = (self.seq, *q)
+            self._since_key = 0
+            data = {"seq": self.seq, "key": True,
+                    "x": q[0] / POSE_SCALE, "y": q[1] / POSE_SCALE, "yaw": q[2] / POSE_SCALE}
+        else:
+            key_seq, kx, ky, kyaw = self._key
+            self._since_key += 1
+            dyaw = round(_wrap((q[2] - kyaw) / POSE_SCALE) * POSE_SCALE)
+            data = {"seq": self.seq, "ref": key_seq, "dx": q[0] - kx, "dy": q[1] - ky, "dyaw": dyaw}
+        self._last_pose = (x, y, yaw)
+        self._last_time = now
+        self.sent += 1
+        return data, keyframe
+
+    def stats(self):
+        return {
+            "hz": self.hz,
+            "min_dist": self.min_dist,
+            "min_yaw_deg": round(math.degrees(self.min_yaw), 2),
+            "sent": self.sent,
+            "skipped": self.skipped,
+        }
@@ -0,0 +1,105 @@
+"""
+回放 ros_socket_server.py --record 录下的 rosbridge 日志。
+收到的消息按原来的节奏（或尽快）喂给一台回放用的小车（RobotSession），
+发往 rosbridge 的消息只计数不外发。
+现场问题复现和消息处理路径的压测都用它：
+
+    python replay_ros_log.py field.rosrec                 # 原速回放
+    python replay_ros_log.py field.rosrec --speed 0       # 尽快回放，输出吞吐量
+    python replay_ros_log.py field.rosrec --port 5000 --stations-file stations.json   # 同时开 TCP，看板可以连上来看
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import ros_socket_server as server
+from ros_recorder import OUTBOUND, read_frames, replay
+from station_cache import StationCache
+
+
+class ReplaySink:
+    """代替 WebSocketApp，记下服务本来要发给 rosbridge 的消息"""
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.sent = 0
+        self.connected = True
+        self._lock = threading.Lock()
+
+    def send(self, data, key=None):
+        with self._lock:
+            self.sent += 1
+        if self.verbose:
+            print(f"📤 {data if isinstance(data, str) else data.decode('utf-8', 'replace')}")
+
+    def start(self):
+        pass
+
+    def stats(self):
+        return {"connected": True, "sent": self.sent}
+
+
+def count_outbound(path):
+    return sum(1 for _, direction, _ in read_frames(path) if direction == OUTBOUND)
+
+
+async def run(args):
+    loop = asyncio.get_running_loop()
+    server.main_loop = loop
+    server.scheduler.attach(loop)
+    robot = server.robots[args.robot] = server.RobotSession(args.robot, None)
+    sink = robot.client = ReplaySink(args.verbose)
+
+    tcp_task = None
+    if args.port:
+        tcp_task = asyncio.create_task(server.start_tcp_server(args.host, args.port, metrics_port=0))
+
+    total = 0
+    started = time.perf_counter()
+    for _ in range(args.loops):
+        # on_message 原本跑在 websocket 线程里，回放也放到单独线程
+        total += await loop.run_in_executor(None, replay, args.log, robot.on_message, args.speed)
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.1)  # 让事件循环处理完回放产生的推送
+
+    recorded_out = count_outbound(args.log) * args.loops
+    print("📊 回放结果")
+    print(f"  收到消息     {total} 条，用时 {elapsed:.3f} 秒，{total / elapsed if elapsed else 0:.0f} 条/秒")
+    print(f"  发往 ROS     回放 {sink.sent} 条，录制时 {recorded_out} 条")
+
+    if tcp_task is not None:
+        if args.keep_running:
+            print("⏸️ 回放结束，TCP 服务继续运行（Ctrl+C 退出）")
+            await tcp_task
+        tcp_task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放 rosbridge 录制日志")
+    parser.add_argument("log", help="ros_socket_server.py --record 生成的文件")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放倍速，0 表示尽快")
+    parser.add_argument("--robot", default=server.DEFAULT_ROBOT_ID, help="回放小车的 id")
+    parser.add_argument("--loops", type=int, default=1, help="重复回放次数（压测用）")
+    parser.add_argument("--stations-file", help="从 JSON 文件读取站点，不连 MySQL")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="同时开 TCP 服务的端口，0 表示不开")
+    parser.add_argument("--keep-running", action="store_true", help="回放结束后 TCP 服务不退出")
+    parser.add_argument("--verbose", action="store_true", help="打印发往 rosbridge 的消息")
+    args = parser.parse_args()
+
+    if args.stations_file:
+        # 和 ros_socket_server.py 的 --stations-file 一样：不启动 MySQL 同步，加载后重建代价矩阵
+        server.station_mirror = None
+        server.cost_matrix = server.StationCostMatrix(None, speed=server.NAV_SPEED)  # 回放不覆盖现场的缓存文件
+        server.station_cache = StationCache(lambda: server.load_stations_file(args.stations_file), ttl=0,
+                                            on_reload=server.on_stations_loaded)
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("🛑 手动中断")
+
+
+if __name__ == "__main__":
+    main()
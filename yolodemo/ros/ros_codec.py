@@ -0,0 +1,297 @@
+"""
+rosbridge / 客户端消息编解码。
+优先使用 orjson，其次 ujson，都没有时退回标准库 json；输出统一是 UTF-8 bytes。
+rosbridge 下发的 CBOR（需要 cbor2）、png 压缩和 fragment 分片由 RosFrameDecoder 还原。
+客户端可以协商改用 4 字节长度前缀 + MessagePack 的二进制帧（需要 msgpack）。
+"""
+import base64
+import datetime
+import decimal
+import json
+import re
+import struct
+import time
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def _default(obj):
+    # pymysql 返回的 DECIMAL / DATETIME 列
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat(sep=" ") if isinstance(obj, datetime.datetime) else obj.isoformat()
+    raise TypeError(f"无法序列化类型: {type(obj).__name__}")
+
+
+def _std_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj, default=_default)
+
+
+def _ujson_dumps(obj):
+    try:
+        return ujson.dumps(obj, ensure_ascii=False).encode("utf-8")
+    except TypeError:
+        return _std_dumps(obj)
+
+
+_BACKENDS = {"json": (_std_dumps, json.loads)}
+if ujson is not None:
+    _BACKENDS["ujson"] = (_ujson_dumps, ujson.loads)
+if orjson is not None:
+    _BACKENDS["orjson"] = (_orjson_dumps, orjson.loads)
+
+backend = None
+dumps = None
+loads = None
+
+
+def set_backend(name=None):
+    """切换 JSON 后端；name 为空时自动选最快的可用后端"""
+    global backend, dumps, loads
+    if name is None:
+        name = "orjson" if "orjson" in _BACKENDS else "ujson" if "ujson" in _BACKENDS else "json"
+    if name not in _BACKENDS:
+        print(f"⚠️ JSON 后端 {name} 不可用，改用标准库 json")
+        name = "json"
+    backend = name
+    dumps, loads = _BACKENDS[name]
+    return name
+
+
+set_backend()
+
+
+def dumps_line(obj):
+    """客户端协议：一行一个 JSON"""
+    return dumps(obj) + b"\n"
+
+
+_FRAME_HEADER = struct.Struct(">I")
+
+
+def dumps_frame(obj):
+    """客户端二进制协议：4 字节大端长度 + MessagePack"""
+    body = msgpack.packb(obj, default=_default, use_bin_type=True)
+    return _FRAME_HEADER.pack(len(body)) + body
+
+
+def loads_frame(body):
+    """解一帧的 MessagePack 内容（不含长度前缀）"""
+    return msgpack.unpackb(body, raw=False)
+
+
+# ---------- 话题预检 ----------
+
+# rosbridge 下发的消息 op / topic 在最前面，只看开头一小段就够了
+_PEEK_LEN = 128
+_TOPIC_RE_STR = re.compile(r'"topic"\s*:\s*"([^"]*)"')
+_TOPIC_RE_BYTES = re.compile(rb'"topic"\s*:\s*"([^"]*)"')
+
+
+def peek_topic(raw):
+    """不做完整解析，取出消息的 topic；找不到时返回 None"""
+    if isinstance(raw, str):
+        m = _TOPIC_RE_STR.search(raw, 0, _PEEK_LEN)
+        return m.group(1) if m else None
+    m = _TOPIC_RE_BYTES.search(raw, 0, _PEEK_LEN)
+    return m.group(1).decode("utf-8", "replace") if m else None
+
+
+# ---------- 预先序列化好的常量消息 ----------
+
+STOP_CMD_VEL = _std_dumps({
+    "op": "publish",
+    "topic": "/cmd_vel",
+    "msg": {
+        "linear": {"x": 0.0, "y": 0.0, "z": 0.0},
+        "angular": {"x": 0.0, "y": 0.0, "z": 0.0}
+    }
+})
+
+CLEAR_COSTMAPS = _std_dumps({
+    "op": "call_service",
+    "service": "/move_base/clear_costmaps",
+    "args": {}
+})
+
+CANCEL_ALL_GOALS = _std_dumps({
+    "op": "publish",
+    "topic": "/move_base/cancel",
+    "msg": {
+        "stamp": {"secs": 0, "nsecs": 0},
+        "id": ""
+    }
+})
+
+_CMD_VEL_TEMPLATE = ('{"op":"publish","topic":"/cmd_vel","msg":{"linear":{"x":%r,"y":0.0,"z":0.0},'
+                     '"angular":{"x":0.0,"y":0.0,"z":%r}}}')
+
+
+def cmd_vel(angular_z, linear_x=0.0):
+    if angular_z == 0.0 and linear_x == 0.0:
+        return STOP_CMD_VEL
+    return (_CMD_VEL_TEMPLATE % (float(linear_x), float(angular_z))).encode("ascii")
+
+
+# ---------- rosbridge 压缩 / 分片解码 ----------
+
+# RFC 8746 typed array 标签 -> (struct 字节序, 元素类型)；rosbridge 的 cbor 压缩用它传数值数组
+_TYPED_ARRAY_TAGS = {
+    64: (">", "B"), 65: (">", "H"), 66: (">", "I"), 67: (">", "Q"), 68: (">", "B"),
+    69: ("<", "H"), 70: ("<", "I"), 71: ("<", "Q"),
+    72: (">", "b"), 73: (">", "h"), 74: (">", "i"), 75: (">", "q"),
+    77: ("<", "h"), 78: ("<", "i"), 79: ("<", "q"),
+    80: (">", "e"), 81: (">", "f"), 82: (">", "d"),
+    84: ("<", "e"), 85: ("<", "f"), 86: ("<", "d"),
+}
+
+
+def _cbor_tag_hook(*args):
+    # cbor2 5.x 调用 tag_hook(decoder, tag)，6.x 起改成 tag_hook(tag, immutable)
+    tag = args[0] if isinstance(args[0], cbor2.CBORTag) else args[1]
+    spec = _TYPED_ARRAY_TAGS.get(tag.tag)
+    if spec is None:
+        return tag
+    if tag.tag == 64:
+        return tag.value  # uint8[] 保持 bytes
+    order, fmt = spec
+    count = len(tag.value) // struct.calcsize(fmt)
+    return list(struct.unpack(f"{order}{count}{fmt}", tag.value))
+
+
+def cbor_loads(data):
+    if cbor2 is None:
+        raise RuntimeError("收到 CBOR 消息，但没有安装 cbor2")
+    return cbor2.loads(data, tag_hook=_cbor_tag_hook)
+
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def png_unpack(data):
+    """
+    解出 rosbridge png 压缩里的原始字节（8 位 RGB / 灰度 PNG），只用标准库。
+    rosbridge 把 JSON 文本当像素塞进图片，末尾用换行补齐。
+    """
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError("不是 PNG 数据")
+    pos = 8
+    idat = []
+    width = height = bpp = 0
+    while pos < len(data):
+        length, ctype = struct.unpack(">I4s", data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if ctype == b"IHDR":
+            width, height, depth, color = struct.unpack(">IIBB", chunk[:10])
+            if depth != 8 or color not in (0, 2, 6):
+                raise ValueError(f"不支持的 PNG 格式: depth={depth}, color={color}")
+            bpp = {0: 1, 2: 3, 6: 4}[color]
+        elif ctype == b"IDAT":
+            idat.append(chunk)
+        elif ctype == b"IEND":
+            break
+
+    raw = zlib.decompress(b"".join(idat))
+    stride = width * bpp
+    out = bytearray(stride * height)
+    prev = bytearray(stride)
+    src = 0
+    for row in range(height):
+        ftype = raw[src]
+        line = bytearray(raw[src + 1:src + 1 + stride])
+        src += 1 + stride
+        if ftype == 1:
+            for i in range(bpp, stride):
+                line[i] = (line[i] + line[i - bpp]) & 0xFF
+        elif ftype == 2:
+            for i in range(stride):
+                line[i] = (line[i] + prev[i]) & 0xFF
+        elif ftype == 3:
+            for i in range(stride):
+                left = line[i - bpp] if i >= bpp else 0
+                line[i] = (line[i] + ((left + prev[i]) >> 1)) & 0xFF
+        elif ftype == 4:
+            for i in range(stride):
+                left = line[i - bpp] if i >= bpp else 0
+                up_left = prev[i - bpp] if i >= bpp else 0
+                line[i] = (line[i] + _paeth(left, prev[i], up_left)) & 0xFF
+        out[row * stride:(row + 1) * stride] = line
+        prev = line
+    return bytes(out)
+
+
+class RosFrameDecoder:
+    """
+    一条 rosbridge 连接的解码器：处理 JSON 文本、CBOR 二进制帧、png 压缩和 fragment 分片。
+    decode 返回完整的消息 dict；分片还没收齐时返回 None。
+    """
+
+    FRAGMENT_TIMEOUT = 10.0
+
+    def __init__(self):
+        self._fragments = {}  # id -> [parts, received, first_seen]
+
+    def decode(self, raw):
+        if isinstance(raw, (bytes, bytearray)) and raw[:1] not in (b"{", b"[", b" "):
+            return cbor_loads(raw)
+        data = loads(raw)
+        op = data.get("op")
+        if op == "fragment":
+            return self._add_fragment(data)
+        if op == "png":
+            return self.decode(png_unpack(base64.b64decode(data["data"])).rstrip(b"\n\x00"))
+        return data
+
+    def _add_fragment(self, data):
+        now = time.monotonic()
+        frag_id = data.get("id")
+        total = int(data["total"])
+        entry = self._fragments.get(frag_id)
+        if entry is None:
+            self._expire(now)
+            entry = self._fragments[frag_id] = [[None] * total, 0, now]
+        parts = entry[0]
+        num = int(data["num"])
+        if parts[num] is None:
+            parts[num] = data["data"]
+            entry[1] += 1
+        if entry[1] < total:
+            return None
+        del self._fragments[frag_id]
+        return self.decode("".join(parts))
+
+    def _expire(self, now):
+        stale = [k for k, v in self._fragments.items() if now - v[2] > self.FRAGMENT_TIMEOUT]
+        for key in stale:
+            print(f"⚠️ rosbridge 分片 {key} 超时未收齐，已丢弃")
+            del self._fragments[key]
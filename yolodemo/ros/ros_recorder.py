@@ -0,0 +1,128 @@
+"""
+rosbridge 消息录制 / 回放。
+文件是 gzip 压缩的日志，每一帧：
+    <d 时间戳> <B 方向> <B 类型> <I 长度> + 数据
+方向：0 = rosbridge 发来的消息，1 = 我们发给 rosbridge 的消息
+类型：0 = 文本，1 = 二进制（CBOR）
+每次启动写一个新文件：field.rosrec 已存在时依次用 field.1.rosrec、field.2.rosrec ……
+不往旧文件后面追加，进程被杀留下的半截 gzip 不会让后面的数据都读不出来。
+"""
+import gzip
+import os
+import struct
+import threading
+import time
+import zlib
+
+INBOUND = 0
+OUTBOUND = 1
+
+_TEXT = 0
+_BINARY = 1
+_HEADER = struct.Struct("<dBBI")
+
+
+class RosRecorder:
+    """
+    线程安全：rosbridge 线程写收到的消息，事件循环线程写发出的消息。
+    每隔 flush_interval 秒做一次同步 flush，进程崩溃时最多丢这么多秒的数据。
+    """
+
+    def __init__(self, path, flush_interval=1.0, compresslevel=6):
+        self.path, self._file = _open_segment(path, compresslevel)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.frames = 0
+        self.bytes = 0
+
+    def write(self, direction, data):
+        if isinstance(data, str):
+            kind = _TEXT
+            data = data.encode("utf-8")
+        else:
+            kind = _BINARY if direction == INBOUND else _TEXT
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(_HEADER.pack(time.time(), direction, kind, len(data)))
+            self._file.write(data)
+            self.frames += 1
+            self.bytes += len(data)
+            now = time.monotonic()
+            if now - self._last_flush >= self.flush_interval:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _open_segment(path, compresslevel):
+    """独占创建一个还不存在的文件，返回 (实际路径, gzip 文件)"""
+    base, ext = os.path.splitext(path)
+    candidate = path
+    index = 0
+    while True:
+        try:
+            return candidate, gzip.open(candidate, "xb", compresslevel=compresslevel)
+        except FileExistsError:
+            index += 1
+            candidate = f"{base}.{index}{ext}"
+
+
+def read_frames(path):
+    """
+    逐帧读出 (时间戳, 方向, 数据)。文本帧还原成 str，二进制帧保持 bytes，
+    和 websocket-client 回调 on_message 收到的类型一致。
+    文件末尾写了一半的帧或损坏的 gzip 数据（比如进程被杀）当作日志结束。
+    """
+    with gzip.open(path, "rb") as f:
+        while True:
+            try:
+                header = f.read(_HEADER.size)
+            except (EOFError, zlib.error, gzip.BadGzipFile):
+                return
+            if len(header) < _HEADER.size:
+                return
+            stamp, direction, kind, length = _HEADER.unpack(header)
+            if direction not in (INBOUND, OUTBOUND) or kind not in (_TEXT, _BINARY):
+                return  # 截断的 gzip 段后面可能解出乱码
+            try:
+                data = f.read(length)
+            except (EOFError, zlib.error, gzip.BadGzipFile):
+                return
+            if len(data) < length:
+                return
+            if kind == _TEXT:
+                try:
+                    data = data.decode("utf-8")
+                except UnicodeDecodeError:
+                    return
+            yield stamp, direction, data
+
+
+def replay(path, on_message, speed=1.0, direction=INBOUND):
+    """
+    把录下的消息按原来的时间间隔喂给 on_message(None, message)。
+    speed=1 按原速，speed=2 两倍速，speed=0 不等待尽快回放。
+    返回回放的帧数。
+    """
+    count = 0
+    first_stamp = None
+    started = time.monotonic()
+    for stamp, frame_direction, data in read_frames(path):
+        if frame_direction != direction:
+            continue
+        if speed > 0:
+            if first_stamp is None:
+                first_stamp = stamp
+            delay = (stamp - first_stamp) / speed - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+        on_message(None, data)
+        count += 1
+    return count
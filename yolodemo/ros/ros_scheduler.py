@@ -0,0 +1,135 @@
+import threading
+import time
+
+
+class ScheduledAction:
+    """call_later / call_every 返回的句柄，可以随时 cancel"""
+
+    def __init__(self, scheduler, key, fn, args, interval):
+        self._scheduler = scheduler
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.interval = interval  # None 表示只执行一次
+        self.due = 0.0
+        self.cancelled = False
+        self.done = False
+        self._timer = None
+
+    @property
+    def active(self):
+        return not (self.cancelled or self.done)
+
+    def cancel(self):
+        if not self.active:
+            return
+        self.cancelled = True
+        self._scheduler._forget(self)
+        self._scheduler._in_loop(self._cancel_timer)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+class ActionScheduler:
+    """
+    基于 asyncio 事件循环的延时 / 周期动作调度器，用来替代回调里的 time.sleep。
+    - 任意线程（比如 rosbridge 回调线程）都可以调用，定时器统一跑在事件循环里
+    - 同一个 key 已经在等待执行时不会重复排队，直接返回已有句柄
+    - 事件循环还没启动时先记下来，attach 之后再开始计时
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._loop_thread = None
+        self._lock = threading.Lock()
+        self._pending = {}  # key -> ScheduledAction
+        self._deferred = []
+
+    def attach(self, loop):
+        with self._lock:
+            self._loop = loop
+            self._loop_thread = threading.get_ident()
+            deferred, self._deferred = self._deferred, []
+        for action in deferred:
+            if action.active:
+                self._start(action)
+
+    def call_later(self, delay, fn, *args, key=None):
+        return self._schedule(delay, fn, args, key, None)
+
+    def call_every(self, interval, fn, *args, key=None, first_delay=None):
+        delay = interval if first_delay is None else first_delay
+        return self._schedule(delay, fn, args, key, interval)
+
+    def cancel(self, key):
+        with self._lock:
+            action = self._pending.get(key)
+        if action is not None:
+            action.cancel()
+            return True
+        return False
+
+    def is_pending(self, key):
+        with self._lock:
+            return key in self._pending
+
+    def pending_keys(self):
+        with self._lock:
+            return list(self._pending)
+
+    # ---------- 内部实现 ----------
+
+    def _schedule(self, delay, fn, args, key, interval):
+        if key is None:
+            # 没指定 key 时，同一个函数 + 同样参数视为同一个动作
+            key = (fn, args)
+        with self._lock:
+            existing = self._pending.get(key)
+            if existing is not None and existing.active:
+                return existing
+            action = ScheduledAction(self, key, fn, args, interval)
+            action.due = time.monotonic() + delay
+            self._pending[key] = action
+            if self._loop is None:
+                self._deferred.append(action)
+                return action
+        self._in_loop(self._start, action)
+        return action
+
+    def _in_loop(self, fn, *args):
+        if self._loop is None:
+            return
+        if threading.get_ident() == self._loop_thread:
+            fn(*args)
+        else:
+            self._loop.call_soon_threadsafe(fn, *args)
+
+    def _start(self, action):
+        if not action.active:
+            return
+        delay = max(0.0, action.due - time.monotonic())
+        action._timer = self._loop.call_later(delay, self._fire, action)
+
+    def _fire(self, action):
+        action._timer = None
+        if not action.active:
+            return
+        if action.interval is None:
+            action.done = True
+            self._forget(action)
+        try:
+            action.fn(*action.args)
+        except Exception as e:
+            print(f"❌ 定时动作执行失败 {action.key}: {e}")
+        if action.interval is not None and action.active:
+            # 以计划时间为基准推进，避免周期逐渐漂移
+            action.due = max(action.due + action.interval, time.monotonic())
+            self._start(action)
+
+    def _forget(self, action):
+        with self._lock:
+            if self._pending.get(action.key) is action:
+                del self._pending[action.key]
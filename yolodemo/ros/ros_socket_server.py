@@ -1,11 +1,27 @@
+import argparse
+import asyncio
+import itertools
 import json
 import math
-import socket
-import threading
+import os
 import time
 
-import pymysql
-import websocket
+import ros_codec
+import ros_topics
+from bridge_metrics import MetricsRegistry, serve_metrics
+from db_pool import MySQLPool
+from goal_tracker import GoalTracker
+from line_framer import LengthPrefixFramer, LineFramer
+from outbound_queue import DROP_OLDEST, OutboundQueue
+from pose_stream import PoseSubscription
+from ros_recorder import INBOUND, OUTBOUND, RosRecorder
+from ros_scheduler import ActionScheduler
+from rosbridge_client import RosbridgeClient
+from route_planner import Route, plan_route, route_length
+from rotate_controller import RotationController, yaw_from_quaternion
+from station_cache import StationCache
+from station_costs import StationCostMatrix, path_length
+from station_mirror import StationMirror
 
 # 数据库配置
 db_config = {
@@ -16,379 +32,1148 @@ db_config = {
     "port": 3306
 }
 
-ros_ws = None
-current_client_conn = None
-is_handling = False
-current_station_index = -1
-amcl_converged = False  # ➕ 标记AMCL是否已收教
+main_loop = None  # TCP 服务和所有小车共用的 asyncio 事件循环
+clients = {}  # 已连接客户端登记表: id(session) -> ClientSession
+robots = {}  # 小车登记表: robot_id -> RobotSession，第一台是客户端的默认小车
+ros_topic_config = ros_topics.load_topic_config()
+scheduler = ActionScheduler()  # 延时 / 周期 ROS 动作，跑在 main_loop 里
+MAX_COMMAND_LINE = 4096  # 单条客户端指令的最大字节数
+RECV_BUFFER_SIZE = 65536
+CLIENT_QUEUE_SIZE = 256  # 每个客户端最多积压的消息条数
+CLIENT_QUEUE_POLICY = DROP_OLDEST  # 积压满了的处理方式：drop_oldest / drop_newest / disconnect
+KNOWN_COMMANDS = {"cmd", "turn", "cancel", "goals", "stats", "reload", "robot", "robots", "cost", "route", "proto", "pose"}  # 指标按指令名分组，其余算 unknown
+# 客户端协议：默认一行一个 JSON；发送 proto:msgpack 后双向改用 4 字节长度前缀 + MessagePack（需要 msgpack）
+CLIENT_PROTOCOLS = {"json": ros_codec.dumps_line}
+if ros_codec.msgpack is not None:
+    CLIENT_PROTOCOLS["msgpack"] = ros_codec.dumps_frame
+# 同一个 key 的消息在队列里只保留最新一条
+COALESCE_KEYS = {
+    "amcl_status": "amcl",
+    "amcl_lost": "amcl",
+    "turn_progress": "turn",
+    "goal_progress": "goal_progress",
+    "robot_pose": "robot_pose",  # 增量相对关键帧，可以直接替换；关键帧入队后设屏障，不会被替换
+}
+POSE_MAX_HZ = 20  # pose:sub 允许的最高推送频率（实际还受 /amcl_pose 的 throttle_rate 限制）
+ROTATE_RATE_HZ = 10  # 旋转时 /cmd_vel 的发布频率
+ROTATE_TOLERANCE_DEG = 2.0  # 航向误差小于这个角度就认为转到位
+STATION_CACHE_TTL = 300  # 站点缓存有效期（秒），也可以发送 reload 指令立即刷新
+STATION_MIRROR_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "station_mirror.db")
+STATION_SYNC_INTERVAL = 30  # 本地副本和 MySQL 对账的间隔（秒）
+GOAL_TIMEOUT = 180  # 单个导航目标的最长执行时间（秒），超时取消后重试
+GOAL_MAX_RETRIES = 1
+ROS_TOPICS = {"/odom", "/amcl_pose", "/move_base/result", "/move_base/status", "/move_base/feedback"}  # 需要处理的订阅话题
+ROSBRIDGE_URL = "ws://192.168.1.197:9090"
+ROSBRIDGE_BUFFER_SIZE = 200  # 断线期间最多缓冲的发往 rosbridge 的消息数，/cmd_vel 只留最新一条
+# 小车列表 {"cart1": "ws://192.168.1.197:9090", "cart2": "ws://192.168.1.198:9090"}，
+# 没有这个文件时只连 ROSBRIDGE_URL 一台
+ROBOTS_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "robots_config.json")
+DEFAULT_ROBOT_ID = "default"
+METRICS_PORT = 0  # Prometheus 指标端口，默认不开，需要时用 --metrics-port 指定（如 9101）
+STATION_COSTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "station_costs.json")
+NAV_SPEED = 0.3  # 估算 ETA 用的平均行驶速度（米/秒）
+STATION_NEAR_DIST = 0.5  # 离站点这么近就认为停在站上，ETA 用代价矩阵
+MAKE_PLAN_SERVICE = "/move_base/make_plan"
+MAKE_PLAN_INTERVAL = 0.2  # 两次 make_plan 之间的间隔（秒），别让规划器一直满负荷
+SERVICE_TIMEOUT = 5.0
+
+
+# ---------- 运行指标 ----------
+
+metrics = MetricsRegistry()
+ros_messages = metrics.counter("ros_messages_total", "收到的 rosbridge 消息数", ["robot", "topic"])
+ros_messages_skipped = metrics.counter("ros_messages_skipped_total", "只看 topic 就跳过的 rosbridge 消息数", ["robot"])
+ros_decode_errors = metrics.counter("ros_decode_errors_total", "解码失败被丢弃的 rosbridge 帧", ["robot"])
+ros_decode_seconds = metrics.histogram("ros_decode_seconds", "rosbridge 消息解码耗时")
+client_commands = metrics.counter("client_commands_total", "客户端指令数", ["cmd"])
+pose_updates = metrics.counter("pose_updates_total", "推给客户端的实时位姿", ["kind"])
+client_send_latency = metrics.histogram("client_send_latency_seconds", "消息从入队到写入 socket 的耗时")
+db_query_seconds = metrics.histogram("db_query_seconds", "站点查询耗时")
+
+
+def _queue_depths():
+    depths = [len(c.queue) for c in clients.values()]
+    return {("total",): sum(depths), ("max",): max(depths, default=0)}
+
+
+def _db_pool_gauges():
+    stats = db_pool.stats()
+    return {(name,): stats[name] for name in ("size", "idle", "in_use", "waits", "misses")}
+
+
+metrics.gauge("clients_connected", "已连接客户端数", fn=lambda: len(clients))
+metrics.gauge("client_queue_depth", "客户端发送队列积压", ["kind"], fn=_queue_depths)
+metrics.gauge("db_pool", "MySQL 连接池状态", ["field"], fn=_db_pool_gauges)
+metrics.gauge("robot_connected", "小车 rosbridge 是否在线", ["robot"],
+              fn=lambda: {(r.robot_id,): int(r.connected) for r in robots.values()})
+metrics.gauge("rosbridge_buffered", "断线期间缓冲的待发消息数", ["robot"],
+              fn=lambda: {(r.robot_id,): r.client.stats()["buffered"] for r in robots.values() if r.client})
 
 
 # ---------- 数据库操作 ----------
 
+db_pool = MySQLPool(db_config, max_size=4, idle_timeout=300)
+
+
 def fetch_station_data():
-    conn = pymysql.connect(**db_config)
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-    cursor.execute("SELECT * FROM my_station ORDER BY station_order")
-    result = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return result
+    started = db_query_seconds.start()
+    try:
+        return db_pool.query("SELECT * FROM my_station ORDER BY station_order")
+    finally:
+        db_query_seconds.stop(started)
 
 
-def quaternion_from_yaw(deg):
-    rad = math.radians(deg)
-    return {
-        "x": 0.0,
-        "y": 0.0,
-        "z": math.sin(rad / 2),
-        "w": math.cos(rad / 2)
-    }
+def fetch_station_checksum():
+    row = db_pool.query("CHECKSUM TABLE my_station", one=True)
+    return row.get("Checksum") if row else None
+
+
+def load_stations_file(path):
+    """从 JSON 文件读取站点（格式同 my_station 表），离线调试和压测时代替 MySQL"""
+    with open(path, "r", encoding="utf-8") as f:
+        return sorted(json.load(f), key=lambda row: row["station_order"])
 
 
 def get_station_pose(index):
-    conn = pymysql.connect(**db_config)
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-    cursor.execute("SELECT * FROM my_station WHERE station_order = %s", (index,))
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    if row:
-        z = row["station_z"]
-        w = row["station_w"]
-        yaw_rad = 2 * math.atan2(z, w)
-        yaw_deg = math.degrees(yaw_rad)
-
-        if -30 <= yaw_deg <= 30:
-            quat = quaternion_from_yaw(0)
-        elif 60 <= yaw_deg <= 120:
-            quat = quaternion_from_yaw(90)
-        elif yaw_deg >= 150 or yaw_deg <= -150:
-            quat = quaternion_from_yaw(180)
-        elif -120 <= yaw_deg <= -60:
-            quat = quaternion_from_yaw(-90)
-        else:
-            quat = {"x": 0.0, "y": 0.0, "z": z, "w": w}
+    return station_cache.get_pose(index)
 
-        return {
-            "position": {
-                "x": row["station_x"],
-                "y": row["station_y"],
-                "z": 0.0
-            },
-            "orientation": quat
-        }
-    return None
 
+def on_stations_loaded(rows):
+    """站点位置变了就重建代价矩阵，再用 make_plan 逐对细化"""
+    cost_matrix.rebuild(rows)
+    if main_loop is not None:
+        main_loop.call_soon_threadsafe(refine_costs)
 
-# ---------- TCP 逻辑 ----------
 
-def send_json(conn, obj):
-    try:
-        message = json.dumps(obj, ensure_ascii=False) + "\n"
-        conn.sendall(message.encode("utf-8"))
-    except Exception as e:
-        print(f"❌ 发送失败: {e}")
+cost_matrix = StationCostMatrix(STATION_COSTS_FILE, speed=NAV_SPEED)
+# 站点先读本地 SQLite 副本，后台和 MySQL 同步；--stations-file 时不用副本
+station_mirror = StationMirror(STATION_MIRROR_FILE, fetch_station_data, fetch_station_checksum,
+                               on_change=lambda: station_cache.refresh_async())
+station_cache = StationCache(station_mirror.rows, ttl=STATION_CACHE_TTL, on_reload=on_stations_loaded)
 
 
-def handle_client(conn, addr):
-    global current_client_conn
-    current_client_conn = conn
-    print(f"✅ 客户端连接: {addr}")
+def reload_stations():
+    """reload 指令：先找 MySQL 要最新数据（连不上就用本地副本），再刷新缓存"""
+    if station_mirror is not None:
+        try:
+            station_mirror.sync()
+        except Exception as e:
+            print(f"⚠️ 站点同步失败，使用本地副本: {e}")
+    return station_cache.reload()
 
-    try:
-        stations = fetch_station_data()
-        send_json(conn, {
-            "current_station_index": current_station_index,
-            "type": "station_list",
-            "data": stations,
-            "msg": "初始化站点数据",
+
+async def ensure_stations_loaded():
+    """首次加载放到线程池里做，之后都直接读内存"""
+    if not station_cache.loaded:
+        await asyncio.get_running_loop().run_in_executor(None, station_cache.load_if_needed)
+
+
+def load_robot_config(path=ROBOTS_CONFIG_FILE):
+    if not os.path.exists(path):
+        return {DEFAULT_ROBOT_ID: ROSBRIDGE_URL}
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    if not config:
+        raise ValueError(f"{path} 里没有配置小车")
+    return config
+
+
+# ---------- TCP 逻辑 ----------
+
+class ClientSession:
+    """一个 TCP 客户端连接（平板 / 看板），只在事件循环线程里使用"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.addr = writer.get_extra_info("peername")
+        self.robot_id = next(iter(robots), None)  # 当前操作的小车，用 robot:<id> 切换
+        self.proto = "json"  # 用 proto:<name> 切换，见 CLIENT_PROTOCOLS
+        self.pose_sub = None  # pose:sub 之后的实时位姿订阅
+        self._pose_timer = None  # 频率限制挡住时，到点再推一次最新位姿
+        self.queue = OutboundQueue(CLIENT_QUEUE_SIZE, CLIENT_QUEUE_POLICY)
+        self.closed = False
+        self._wakeup = asyncio.Event()
+        self._writer_task = asyncio.create_task(self._run_writer())
+
+    def write(self, data, key=None):
+        """只放进发送队列，真正的网络发送由 _run_writer 完成，不会阻塞调用方"""
+        if self.closed:
+            return
+        if not self.queue.put(data, key):
+            print(f"⚠️ 客户端 {self.addr} 发送队列已满（{len(self.queue)}），断开连接")
+            self.close()
+            return
+        self._wakeup.set()
+
+    async def _run_writer(self):
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while len(self.queue):
+                    self.writer.write(b"".join(self.queue.pop_batch()))
+                    await self.writer.drain()
+                    client_send_latency.observe(time.perf_counter() - self.queue.last_batch_enqueued)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"❌ 发送失败 {self.addr}: {e}")
+            self.close()
+
+    def set_proto(self, proto):
+        # 已经排队的消息按旧协议发出，新消息不能再原地替换它们
+        self.queue.barrier()
+        self.proto = proto
+
+    def unsubscribe_pose(self):
+        self.pose_sub = None
+        if self._pose_timer is not None:
+            self._pose_timer.cancel()
+            self._pose_timer = None
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.unsubscribe_pose()
+        self._writer_task.cancel()
+        self.writer.close()
+
+    def stats(self):
+        result = self.queue.stats()
+        result["addr"] = f"{self.addr[0]}:{self.addr[1]}" if self.addr else ""
+        result["robot"] = self.robot_id
+        result["proto"] = self.proto
+        result["pose"] = self.pose_sub.stats() if self.pose_sub else None
+        return result
+
+
+def send_json(client, obj):
+    """按客户端协商的协议编码（默认 JSON 行）后放进发送队列"""
+    client.write(CLIENT_PROTOCOLS[client.proto](obj), COALESCE_KEYS.get(obj.get("type")))
+
+
+def _broadcast(obj, robot_id=None):
+    key = COALESCE_KEYS.get(obj.get("type"))
+    encoded = {}  # 每种协议只编码一次
+    for client in list(clients.values()):
+        if robot_id is None or client.robot_id == robot_id:
+            data = encoded.get(client.proto)
+            if data is None:
+                data = encoded[client.proto] = CLIENT_PROTOCOLS[client.proto](obj)
+            client.write(data, key)
+
+
+def broadcast(obj, robot_id=None):
+    """
+    推送给所有已连接客户端（给了 robot_id 时只推给正在操作这台车的客户端），
+    任意线程都可以调用
+    """
+    if main_loop is None or not clients:
+        return
+    main_loop.call_soon_threadsafe(_broadcast, obj, robot_id)
+
+
+def push_pose(client):
+    """按客户端的订阅参数推一次所在小车的最新位姿，只在事件循环线程里调用"""
+    sub = client.pose_sub
+    robot = robots.get(client.robot_id)
+    if sub is None or client.closed or robot is None or robot.pose is None:
+        return
+    now = time.monotonic()
+    data, keyframe = sub.update(robot.pose + (robot.yaw,), now)
+    if data is not None:
+        send_json(client, {
+            "type": "robot_pose",
+            "robot": robot.robot_id,
+            "data": data,
+            "msg": "",
             "success": True
         })
+        if keyframe:
+            client.queue.barrier("robot_pose")
+        pose_updates.inc("key" if keyframe else "delta")
+    elif client._pose_timer is None:
+        wait = sub.wait_time(now)
+        if wait > 0:
+            client._pose_timer = main_loop.call_later(wait, _pose_timer_fired, client)
 
-        while True:
-            data = conn.recv(1024)
-            if not data:
-                break
-            msg = data.decode().strip()
-            print(f"📥 收到指令: {msg}")
 
-            if msg.startswith("cmd:"):
-                index = int(msg.split(":")[1])
+def _pose_timer_fired(client):
+    client._pose_timer = None
+    push_pose(client)
 
-                if not amcl_converged:
-                    send_json(conn, {
-                        "type": "cmd_reject",
-                        "data": {"station": index},
-                        "msg": "❌ 当前定位未收敛，导航命令已拒绝",
-                        "success": False
-                    })
-                    print(f"⛔ 拒绝导航到站点 {index}：AMCL 未收敛")
-                    continue
-
-                send_json(conn, {
-                    "type": "cmd_ack",
-                    "data": {"station": index},
-                    "msg": f"收到跳转指令：{index}",
-                    "success": True
-                })
-                pose = get_station_pose(index)
-                if pose:
-                    publish_navigation_goal(pose, index)
-                else:
-                    print(f"❌ 未找到第 {index} 号站点")
-
-            elif msg.startswith("turn:"):
-                angle = int(msg.split(":")[1])
-                send_json(conn, {
-                    "type": "turn_ack",
-                    "msg": f"开始旋转 {angle} 度",
-                    "data": {},
-                    "success": True
-                })
-                rotate_robot(angle, angular_speed=0.3)
-            else:
-                send_json(conn, {
+
+def station_list_message(client, msg):
+    robot = robots.get(client.robot_id)
+    return {
+        "current_station_index": robot.current_station_index if robot else -1,
+        "robot": client.robot_id,
+        "type": "station_list",
+        "data": station_cache.stations(),
+        "msg": msg,
+        "success": True
+    }
+
+
+async def handle_command(client, msg):
+    loop = asyncio.get_running_loop()
+    name = msg.split(":", 1)[0]
+    client_commands.inc(name if name in KNOWN_COMMANDS else "unknown")
+
+    if msg == "robots":
+        send_json(client, {
+            "type": "robots",
+            "data": [r.stats() for r in robots.values()],
+            "msg": f"共 {len(robots)} 台小车",
+            "success": True
+        })
+        return
+    if msg.startswith("robot:"):
+        robot_id = msg.split(":", 1)[1].strip()
+        if robot_id not in robots:
+            send_json(client, {
+                "type": "error",
+                "msg": f"没有这台小车: {robot_id}",
+                "data": {"robots": list(robots)},
+                "success": False
+            })
+            return
+        client.robot_id = robot_id
+        send_json(client, station_list_message(client, f"已切换到小车 {robot_id}"))
+        if client.pose_sub is not None:
+            client.pose_sub.reset()
+            push_pose(client)
+        return
+    if msg.startswith("proto:"):
+        proto = msg.split(":", 1)[1].strip()
+        if proto not in CLIENT_PROTOCOLS:
+            send_json(client, {
+                "type": "error",
+                "msg": f"不支持的协议: {proto}",
+                "data": {"protocols": list(CLIENT_PROTOCOLS)},
+                "success": False
+            })
+            return
+        # 确认用旧协议发出，之后的收发都换成新协议；客户端收到确认后再发新协议的帧
+        send_json(client, {
+            "type": "proto_ack",
+            "data": {"proto": proto, "max_frame": MAX_COMMAND_LINE},
+            "msg": f"已切换到 {proto} 协议",
+            "success": True
+        })
+        client.set_proto(proto)
+        send_json(client, station_list_message(client, f"已切换到 {proto} 协议"))
+        return
+
+    robot = robots.get(client.robot_id)
+    if robot is None:
+        send_json(client, {
+            "type": "error",
+            "msg": "没有可用的小车",
+            "data": {},
+            "success": False
+        })
+        return
+
+    if msg.startswith("cmd:"):
+        index = int(msg.split(":")[1])
+
+        if not robot.amcl_converged:
+            send_json(client, {
+                "type": "cmd_reject",
+                "robot": robot.robot_id,
+                "data": {"station": index},
+                "msg": "❌ 当前定位未收敛，导航命令已拒绝",
+                "success": False
+            })
+            print(f"⛔ [{robot.robot_id}] 拒绝导航到站点 {index}：AMCL 未收敛")
+            return
+
+        await ensure_stations_loaded()
+        cost = estimate_cost(robot, index)
+        send_json(client, {
+            "type": "cmd_ack",
+            "robot": robot.robot_id,
+            "data": {
+                "station": index,
+                "cost": None if cost is None else round(cost, 2),
+                "eta": None if cost is None else round(cost / NAV_SPEED, 1)
+            },
+            "msg": f"收到跳转指令：{index}",
+            "success": True
+        })
+        pose = get_station_pose(index)
+        if pose:
+            robot.goal_tracker.start(index, pose)
+        else:
+            print(f"❌ 未找到第 {index} 号站点")
+
+    elif msg.startswith("turn:"):
+        angle = int(msg.split(":")[1])
+        send_json(client, {
+            "type": "turn_ack",
+            "robot": robot.robot_id,
+            "msg": f"开始旋转 {angle} 度",
+            "data": {},
+            "success": True
+        })
+        robot.rotate(angle, angular_speed=0.3)
+    elif msg == "cancel":
+        count = robot.goal_tracker.cancel_all("客户端取消导航")
+        send_json(client, {
+            "type": "cancel_ack",
+            "robot": robot.robot_id,
+            "data": {"canceled": count},
+            "msg": f"已取消 {count} 个导航目标",
+            "success": True
+        })
+    elif msg == "goals":
+        send_json(client, {
+            "type": "goals",
+            "robot": robot.robot_id,
+            "data": {"active": robot.goal_tracker.active_goals(), "recent": robot.goal_tracker.recent_goals()},
+            "msg": "导航目标",
+            "success": True
+        })
+    elif msg == "stats":
+        send_json(client, {
+            "type": "stats",
+            "data": {
+                "db_pool": db_pool.stats(),
+                "station_mirror": station_mirror.stats() if station_mirror else None,
+                "clients": [c.stats() for c in clients.values()],
+                "robots": [r.stats() for r in robots.values()]
+            },
+            "msg": "运行统计",
+            "success": True
+        })
+    elif msg.startswith("pose:"):
+        handle_pose_command(client, robot, msg.split(":", 1)[1].strip())
+    elif msg.startswith("route:"):
+        await handle_route_command(client, robot, msg.split(":", 1)[1].strip())
+    elif msg.startswith("cost:"):
+        await ensure_stations_loaded()
+        arg = msg.split(":", 1)[1].strip()
+        if arg == "all":
+            data = cost_matrix.matrix()
+        else:
+            a, b = (int(x) for x in arg.split(","))
+            cost = cost_matrix.cost(a, b)
+            if cost is None:
+                send_json(client, {
                     "type": "error",
-                    "msg": f"未知指令: {msg}",
+                    "msg": f"没有站点 {a} 或 {b}",
                     "data": {},
                     "success": False
                 })
+                return
+            data = {"from": a, "to": b, "cost": round(cost, 2), "eta": round(cost_matrix.eta(a, b), 1),
+                    "source": cost_matrix.source(a, b)}
+        send_json(client, {
+            "type": "cost",
+            "data": data,
+            "msg": "站点行驶代价（米）",
+            "success": True
+        })
+    elif msg == "reload":
+        try:
+            count = await loop.run_in_executor(None, reload_stations)
+        except Exception as e:
+            send_json(client, {
+                "type": "error",
+                "msg": f"站点数据刷新失败: {e}",
+                "data": {},
+                "success": False
+            })
+            return
+        for other in list(clients.values()):
+            send_json(other, station_list_message(other, f"站点数据已刷新（{count} 个）"))
+    else:
+        send_json(client, {
+            "type": "error",
+            "msg": f"未知指令: {msg}",
+            "data": {},
+            "success": False
+        })
+
+
+def make_framer(proto):
+    if proto == "json":
+        return LineFramer(max_line=MAX_COMMAND_LINE)
+    return LengthPrefixFramer(max_frame=MAX_COMMAND_LINE)
+
+
+def decode_frame(proto, frame):
+    """JSON 协议是一行文本；msgpack 协议每帧是一个字符串"""
+    if proto == "json":
+        return frame.decode("utf-8", "replace").strip()
+    value = ros_codec.loads_frame(frame)
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "replace")
+    if not isinstance(value, str):
+        raise ValueError(f"指令帧应为字符串，收到 {type(value).__name__}")
+    return value.strip()
+
+
+async def handle_frame(client, proto, frame):
+    if frame is None:
+        send_json(client, {
+            "type": "error",
+            "msg": f"指令过长（超过 {MAX_COMMAND_LINE} 字节），已丢弃",
+            "data": {},
+            "success": False
+        })
+        return
+    try:
+        msg = decode_frame(proto, frame)
+    except ValueError as e:
+        send_json(client, {
+            "type": "error",
+            "msg": f"指令帧无法解析: {e}",
+            "data": {},
+            "success": False
+        })
+        return
+    if not msg:
+        return
+    print(f"📥 收到指令 {client.addr}: {msg}")
+    try:
+        await handle_command(client, msg)
+    except (ValueError, IndexError):
+        send_json(client, {
+            "type": "error",
+            "msg": f"指令格式错误: {msg}",
+            "data": {},
+            "success": False
+        })
+
+
+async def handle_client(reader, writer):
+    client = ClientSession(reader, writer)
+    clients[id(client)] = client
+    print(f"✅ 客户端连接: {client.addr}（当前 {len(clients)} 个）")
+
+    try:
+        await ensure_stations_loaded()
+        send_json(client, station_list_message(client, "初始化站点数据"))
+
+        proto = client.proto
+        framer = make_framer(proto)
+        while True:
+            data = await reader.read(RECV_BUFFER_SIZE)
+            if not data:
+                break
+
+            # 一次读到的多条指令按顺序处理，回复由发送协程合并写出
+            while data:
+                for frame in framer.feed(data):
+                    await handle_frame(client, proto, frame)
+                data = b""
+                if client.proto != proto:
+                    # 协议切换：还没分出来的字节交给新的分帧器
+                    data = framer.take_pending()
+                    proto = client.proto
+                    framer = make_framer(proto)
 
     except Exception as e:
-        print(f"❌ 客户端异常: {e}")
+        print(f"❌ 客户端异常 {client.addr}: {e}")
     finally:
-        conn.close()
-        print(f"❎ 客户端断开: {addr}")
-        current_client_conn = None
+        clients.pop(id(client), None)
+        client.close()
+        print(f"❎ 客户端断开: {client.addr}（剩余 {len(clients)} 个）")
 
 
-def rotate_robot(angle_deg, angular_speed=0.5):
+async def start_tcp_server(host="0.0.0.0", port=5000, metrics_host="127.0.0.1", metrics_port=METRICS_PORT):
+    global main_loop
+    main_loop = asyncio.get_running_loop()
+    scheduler.attach(main_loop)
+    if metrics_port:
+        try:
+            await serve_metrics(metrics, metrics_host, metrics_port)
+        except OSError as e:
+            # 指标只是辅助，端口被占用时不影响桥接服务
+            print(f"⚠️ 指标接口启动失败（{metrics_host}:{metrics_port}），不导出指标: {e}")
+    try:
+        await main_loop.run_in_executor(None, station_cache.reload)
+    except Exception as e:
+        print(f"⚠️ 启动时加载站点失败，首个客户端连接时重试: {e}")
+    if station_mirror is not None:
+        station_mirror.start(STATION_SYNC_INTERVAL)
+    for robot in robots.values():
+        robot.start()
+    server = await asyncio.start_server(handle_client, host, port, backlog=512)
+    print(f"🚀 TCP 服务器启动: {host}:{port}（{len(robots)} 台小车）")
+    async with server:
+        await server.serve_forever()
+
+
+def handle_pose_command(client, robot, arg):
     """
-    通用旋转函数。正角度表示逆时针，负角度表示顺时针（右转）
+    pose:sub:<hz>[:<min_dist 米>[:<min_yaw 度>]]   订阅当前小车的实时位姿
+    pose:unsub                                     取消订阅
     """
-    if angular_speed <= 0:
-        print("❌ 错误：角速度必须为正值")
+    if arg == "unsub":
+        client.unsubscribe_pose()
+        send_json(client, {
+            "type": "pose_ack",
+            "robot": robot.robot_id,
+            "data": None,
+            "msg": "已取消实时位姿订阅",
+            "success": True
+        })
+        return
+    parts = arg.split(":")
+    if parts[0] != "sub" or not 2 <= len(parts) <= 4:
+        raise ValueError(arg)
+    hz = float(parts[1])
+    if not 0 < hz <= POSE_MAX_HZ:
+        send_json(client, {
+            "type": "error",
+            "msg": f"位姿推送频率应在 0~{POSE_MAX_HZ} Hz 之间",
+            "data": {},
+            "success": False
+        })
+        return
+    sub = PoseSubscription(hz)
+    if len(parts) > 2:
+        sub.min_dist = max(0.0, float(parts[2]))
+    if len(parts) > 3:
+        sub.min_yaw = math.radians(max(0.0, float(parts[3])))
+    client.unsubscribe_pose()
+    client.pose_sub = sub
+    send_json(client, {
+        "type": "pose_ack",
+        "robot": robot.robot_id,
+        "data": sub.stats(),
+        "msg": f"已订阅实时位姿（{hz:g} Hz）",
+        "success": True
+    })
+    push_pose(client)  # 马上给一个关键帧
+
+
+async def handle_route_command(client, robot, arg):
+    """
+    route:3,1,6,2      按给定顺序依次到站
+    route:3,1,6,2:opt  先用最近邻 + 2-opt 重排访问顺序
+    route:all          所有站点，自动排序
+    route:status / route:cancel
+    """
+    if arg == "status":
+        send_json(client, {
+            "type": "route_status",
+            "robot": robot.robot_id,
+            "data": robot.route.to_dict() if robot.route else None,
+            "msg": "巡检路线" if robot.route else "当前没有巡检路线",
+            "success": True
+        })
+        return
+    if arg == "cancel":
+        # 有路线时 route_aborted 会广播给包括发起者在内的客户端
+        if not robot.cancel_route("客户端取消巡检"):
+            send_json(client, {
+                "type": "route_status",
+                "robot": robot.robot_id,
+                "data": None,
+                "msg": "当前没有巡检路线，无需取消",
+                "success": False
+            })
         return
 
-    angle_rad = math.radians(abs(angle_deg))
-    duration = angle_rad / angular_speed
-    angular_z = -angular_speed if angle_deg < 0 else angular_speed
+    if not robot.amcl_converged:
+        send_json(client, {
+            "type": "cmd_reject",
+            "robot": robot.robot_id,
+            "data": {"route": arg},
+            "msg": "❌ 当前定位未收敛，巡检命令已拒绝",
+            "success": False
+        })
+        return
 
-    print(f"🔁 开始旋转 {angle_deg}°，角速度={angular_speed:.2f} rad/s，预计耗时={duration:.2f} 秒")
+    await ensure_stations_loaded()
+    known = {int(row["station_order"]) for row in station_cache.stations()}
+    optimize = arg == "all" or arg.endswith(":opt")
+    if arg == "all":
+        stops = sorted(known)
+    else:
+        stops = list(dict.fromkeys(int(x) for x in arg.split(":")[0].split(",")))
+    unknown = [s for s in stops if s not in known]
+    if not stops or unknown:
+        send_json(client, {
+            "type": "error",
+            "msg": f"巡检站点无效: {unknown or arg}",
+            "data": {},
+            "success": False
+        })
+        return
 
-    cmd_msg = {
-        "op": "publish",
-        "topic": "/cmd_vel",
-        "msg": {
-            "linear": {"x": 0.0, "y": 0.0, "z": 0.0},
-            "angular": {"x": 0.0, "y": 0.0, "z": angular_z}
-        }
-    }
+    start_cost = (lambda s: estimate_cost(robot, s)) if robot.pose is not None else None
+    if optimize:
+        stops = plan_route(stops, cost_matrix.cost, start_cost)
+    robot.start_route(Route(stops, optimized=optimize,
+                            planned_cost=route_length(stops, cost_matrix.cost, start_cost)))
 
-    stop_msg = {
-        "op": "publish",
-        "topic": "/cmd_vel",
-        "msg": {
-            "linear": {"x": 0.0, "y": 0.0, "z": 0.0},
-            "angular": {"x": 0.0, "y": 0.0, "z": 0.0}
-        }
-    }
 
-    start_time = time.time()
-    while time.time() - start_time < duration:
-        ros_ws.send(json.dumps(cmd_msg))
-        time.sleep(0.1)
+# ---------- 行驶代价 ----------
 
-    ros_ws.send(json.dumps(stop_msg))
-    print("✅ 旋转完成，已停止小车")
+def estimate_cost(robot, index):
+    """机器人停在站上时查代价矩阵，否则用当前位置到目标的直线距离"""
+    origin = robot.current_station_index
+    if robot.pose is not None:
+        near = cost_matrix.cost_from(robot.pose[0], robot.pose[1], origin)
+        if near is not None and near <= STATION_NEAR_DIST:
+            return cost_matrix.cost(origin, index)
+        return cost_matrix.cost_from(robot.pose[0], robot.pose[1], index)
+    return cost_matrix.cost(origin, index)
 
 
-def start_tcp_server():
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.bind(("0.0.0.0", 5000))
-    server.listen(5)
-    print("🚀 TCP 服务器启动: 0.0.0.0:5000")
-    try:
-        while True:
-            conn, addr = server.accept()
-            threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
-    except KeyboardInterrupt:
-        server.close()
+_refining = False
+
+
+def refine_costs():
+    """
+    用在线小车的 make_plan 把代价矩阵里的直线距离逐对换成规划路径长度（事件循环线程）。
+    同一时间只有一个请求在途；服务不可用时停下，等小车重连或站点变化再继续。
+    """
+    global _refining
+    if _refining:
+        return
+    robot = next((r for r in robots.values() if r.connected), None)
+    pending = cost_matrix.next_pending()
+    if robot is None or pending is None:
+        if pending is None and cost_matrix.fingerprint is not None:
+            cost_matrix.save()
+        return
+    a, b, row_a, row_b, generation = pending
+    _refining = True
+
+    def done(ok, values):
+        global _refining
+        _refining = False
+        if not ok:
+            print(f"⚠️ [{robot.robot_id}] make_plan 不可用，代价矩阵继续使用直线距离: {values}")
+            return
+        poses = (values or {}).get("plan", {}).get("poses") or []
+        cost_matrix.update(a, b, path_length(poses) if poses else None, generation)
+        if cost_matrix.pending_count() == 0:
+            cost_matrix.save()
+            print("🧮 代价矩阵规划完成")
+        scheduler.call_later(MAKE_PLAN_INTERVAL, refine_costs, key="refine_costs")
+
+    robot.call_service(MAKE_PLAN_SERVICE, {
+        "start": station_pose_stamped(row_a),
+        "goal": station_pose_stamped(row_b),
+        "tolerance": 0.2
+    }, done)
+
+
+def station_pose_stamped(row):
+    return {
+        "header": {"frame_id": "map", "stamp": {"secs": 0, "nsecs": 0}},
+        "pose": {
+            "position": {"x": float(row["station_x"]), "y": float(row["station_y"]), "z": 0.0},
+            "orientation": {"x": 0.0, "y": 0.0, "z": 0.0, "w": 1.0}
+        }
+    }
 
 
 # ---------- ROS WebSocket ----------
 
-def on_ros_open(ws):
-    print("✅ 已连接 ROS WebSocket")
-
-    ws.send(json.dumps({
-        "op": "advertise",
-        "topic": "/move_base/goal",
-        "type": "move_base_msgs/MoveBaseActionGoal"
-    }))
-
-    ws.send(json.dumps({
-        "op": "subscribe",
-        "topic": "/move_base/result"
-    }))
-
-    ws.send(json.dumps({
-        "op": "subscribe",
-        "topic": "/amcl_pose"
-    }))
-
-
-def cancel_navigation_goal():
-    ros_ws.send(json.dumps({
-        "op": "publish",
-        "topic": "/move_base/cancel",
-        "msg": {
-            "stamp": {"secs": 0, "nsecs": 0},
-            "id": ""
-        }
-    }))
-    print("🚫 已取消当前导航目标")
+class RobotSession:
+    """
+    一台小车：自己的 rosbridge 连接、导航目标、旋转控制和 AMCL 状态。
+    websocket-client 每台车一个线程，只负责收包和解码；
+    解码后的消息交给 main_loop 处理，小车状态只在事件循环线程里修改。
+    """
 
+    def __init__(self, robot_id, url, recorder=None):
+        self.robot_id = robot_id
+        self.url = url
+        self.recorder = recorder  # 把 rosbridge 收发的消息都写进日志，用 replay_ros_log.py 回放
+        self.client = None if url is None else RosbridgeClient(
+            url, handshake=self.handshake_messages, on_open=self.on_open, on_message=self.on_message,
+            on_close=self.on_close, on_error=self.on_error, name=robot_id, buffer_size=ROSBRIDGE_BUFFER_SIZE)
+        self.amcl_converged = False
+        self.current_station_index = -1
+        self.pose = None  # AMCL 给出的 (x, y)
+        self.yaw = None  # AMCL 给出的航向（弧度）
+        self.route = None  # 进行中的巡检路线
+        self._service_calls = {}  # call_service id -> callback(ok, values)
+        self._service_seq = itertools.count(1)
+        self.decoder = ros_codec.RosFrameDecoder()  # 还原 CBOR / png / 分片消息
+        self.rotation = RotationController(scheduler, self.publish_cmd_vel, self.broadcast,
+                                           rate_hz=ROTATE_RATE_HZ, tolerance_deg=ROTATE_TOLERANCE_DEG,
+                                           name=robot_id)
+        self.goal_tracker = GoalTracker(scheduler, self.publish_navigation_goal, self.cancel_goal_by_id,
+                                        self.broadcast, on_succeeded=self.on_goal_succeeded,
+                                        on_abandoned=self.on_goal_abandoned,
+                                        timeout=GOAL_TIMEOUT, max_retries=GOAL_MAX_RETRIES, name=robot_id)
+
+    @property
+    def connected(self):
+        return self.client is not None and self.client.connected
+
+    def broadcast(self, obj):
+        obj["robot"] = self.robot_id
+        broadcast(obj, self.robot_id)
+
+    def stats(self):
+        return {
+            "robot": self.robot_id,
+            "url": self.url,
+            "connected": self.connected,
+            "amcl_converged": self.amcl_converged,
+            "current_station_index": self.current_station_index,
+            "rotating": self.rotation.running,
+            "active_goals": self.goal_tracker.active_goals(),
+            "rosbridge": self.client.stats() if self.client else None
+        }
 
-def stop_robot():
-    ros_ws.send(json.dumps({
-        "op": "publish",
-        "topic": "/cmd_vel",
-        "msg": {
-            "linear": {"x": 0.0, "y": 0.0, "z": 0.0},
-            "angular": {"x": 0.0, "y": 0.0, "z": 0.0}
+    # ---------- 发往 rosbridge ----------
+
+    def send(self, data, key=None):
+        """所有发往 rosbridge 的消息都走这里；断线时进缓冲区，同一个 key 只留最新一条"""
+        if self.recorder is not None:
+            self.recorder.write(OUTBOUND, data)
+        self.client.send(data, key)
+
+    def call_service(self, service, args, callback, timeout=SERVICE_TIMEOUT):
+        """
+        rosbridge call_service，按 id 对应 service_response。
+        callback(ok, values) 在事件循环线程里调用，超时按失败处理。
+        """
+        call_id = f"{service}:{next(self._service_seq)}"
+        self._service_calls[call_id] = callback
+        scheduler.call_later(timeout, self._service_done, call_id, False, "timeout",
+                             key=("service_timeout", self.robot_id, call_id))
+        try:
+            self.send(ros_codec.dumps({"op": "call_service", "id": call_id, "service": service, "args": args}))
+        except Exception as e:
+            self._service_done(call_id, False, str(e))
+
+    def _service_done(self, call_id, ok, values):
+        callback = self._service_calls.pop(call_id, None)
+        if callback is None:
+            return
+        scheduler.cancel(("service_timeout", self.robot_id, call_id))
+        callback(ok, values)
+
+    def publish_cmd_vel(self, angular_z, linear_x=0.0):
+        self.send(ros_codec.cmd_vel(angular_z, linear_x), key="cmd_vel")
+
+    def rotate(self, angle_deg, angular_speed=0.5):
+        """
+        通用旋转函数。正角度表示逆时针，负角度表示顺时针（右转）。
+        立即返回，旋转过程由 rotation 控制器按里程计闭环完成。
+        """
+        return self.rotation.start(angle_deg, angular_speed)
+
+    def publish_navigation_goal(self, pose, station_index, goal_id):
+        self.current_station_index = station_index
+
+        goal_msg = {
+            "header": {
+                "seq": 0,
+                "stamp": {"secs": 0, "nsecs": 0},
+                "frame_id": "map"
+            },
+            "goal_id": {
+                "stamp": {"secs": 0, "nsecs": 0},
+                "id": goal_id
+            },
+            "goal": {
+                "target_pose": {
+                    "header": {
+                        "frame_id": "map",
+                        "stamp": {"secs": 0, "nsecs": 0}
+                    },
+                    "pose": pose
+                }
+            }
         }
-    }))
-    clear_costmaps()
-    print("⏹️ 已发送停止运动指令")
-
-
-def on_ros_message(ws, message):
-    global is_handling, amcl_converged
-    data = json.loads(message)
-
-    if data.get("topic") == "/amcl_pose":
-        cov = data["msg"]["pose"]["covariance"]
-        cov_x = cov[0]
-        cov_y = cov[7]
-        #print(cov_x)
-        #print(cov_y)
-        if cov_x < 0.4 and cov_y < 0.4:
-            if not amcl_converged:
-                amcl_converged = True
-                print(f"✅ AMCL 收教：协方差 x={cov_x:.3f}, y={cov_y:.3f}")
-                if current_client_conn:
-                    send_json(current_client_conn, {
+
+        self.send(ros_codec.dumps({
+            "op": "publish",
+            "topic": "/move_base/goal",
+            "msg": goal_msg
+        }))
+        print(f"📤 [{self.robot_id}] 已发布 ROS1 导航目标: {goal_id} -> {station_index} 号站")
+
+    def cancel_navigation_goal(self):
+        self.goal_tracker.cancel_all("定位失效，取消导航")
+        self.send(ros_codec.CANCEL_ALL_GOALS)
+        print(f"🚫 [{self.robot_id}] 已取消当前导航目标")
+
+    def cancel_goal_by_id(self, goal_id):
+        self.send(ros_codec.dumps({
+            "op": "publish",
+            "topic": "/move_base/cancel",
+            "msg": {
+                "stamp": {"secs": 0, "nsecs": 0},
+                "id": goal_id
+            }
+        }))
+
+    def stop_robot(self):
+        if self.rotation.running:
+            self.rotation.stop(False, "旋转被中断")
+        else:
+            self.publish_cmd_vel(0.0)
+        self.clear_costmaps()
+        print(f"⏹️ [{self.robot_id}] 已发送停止运动指令")
+
+    def on_goal_succeeded(self, record):
+        # 到站 3 秒后清代价地图，不能在回调线程里 sleep
+        scheduler.call_later(3, self.clear_costmaps, key=("clear_costmaps_after_arrival", self.robot_id))
+        route = self.route
+        if route is None or record.tag != route.route_id:
+            return
+        route.complete_leg()
+        self._route_progress("arrived", f"巡检第 {route.index}/{len(route.stations)} 站已到达")
+        if route.done:
+            self.route = None
+            print(f"🏁 [{self.robot_id}] 巡检完成: {route.stations}，用时 {route.to_dict()['elapsed']} 秒")
+            self.broadcast({
+                "type": "route_done",
+                "data": route.to_dict(),
+                "msg": "巡检完成",
+                "success": True
+            })
+            return
+        # 上一站一到就发下一站，不等客户端
+        self._dispatch_leg()
+
+    def on_goal_abandoned(self, record, reason):
+        if self.route is not None and record.tag == self.route.route_id:
+            self._abort_route(reason)
+
+    # ---------- 巡检路线 ----------
+
+    def start_route(self, route):
+        if self.route is not None:
+            self._abort_route("被新的巡检路线取代")
+        self.route = route
+        print(f"🗺️ [{self.robot_id}] 开始巡检: {route.stations}" + ("（已优化顺序）" if route.optimized else ""))
+        self._route_progress("started", f"开始巡检 {len(route.stations)} 个站点")
+        self._dispatch_leg()
+
+    def cancel_route(self, reason):
+        """返回是否真的取消了一条路线"""
+        if self.route is None:
+            return False
+        self._abort_route(reason)
+        self.goal_tracker.cancel_all(reason)
+        return True
+
+    def _dispatch_leg(self):
+        route = self.route
+        station = route.current
+        pose = get_station_pose(station)
+        if pose is None:
+            self._abort_route(f"未找到第 {station} 号站点")
+            return
+        route.start_leg()
+        self._route_progress("dispatched", f"前往第 {route.index + 1}/{len(route.stations)} 站: {station}")
+        self.goal_tracker.start(station, pose, tag=route.route_id)
+
+    def _abort_route(self, reason):
+        route, self.route = self.route, None
+        print(f"⚠️ [{self.robot_id}] 巡检中止: {reason}")
+        self.broadcast({
+            "type": "route_aborted",
+            "data": route.to_dict(),
+            "msg": reason,
+            "success": False
+        })
+
+    def _route_progress(self, status, msg):
+        route = self.route
+        data = route.to_dict()
+        data["status"] = status
+        if not route.done:
+            # 剩余路程：当前位置到本站，再加后面各段
+            remaining = estimate_cost(self, route.current) or 0.0
+            for a, b in zip(route.stations[route.index:], route.stations[route.index + 1:]):
+                remaining += cost_matrix.cost(a, b) or 0.0
+            data["remaining_cost"] = round(remaining, 2)
+            data["eta"] = round(remaining / NAV_SPEED, 1)
+        self.broadcast({
+            "type": "route_progress",
+            "data": data,
+            "msg": msg,
+            "success": True
+        })
+
+    def clear_costmaps(self):
+        self.send(ros_codec.CLEAR_COSTMAPS)
+        print(f"🪑 [{self.robot_id}] 已请求清除代价地图")
+
+    # ---------- rosbridge 回调（websocket 线程） ----------
+
+    def handshake_messages(self):
+        """每次连上 rosbridge 都要先发的 advertise / subscribe，由 RosbridgeClient 在补发缓冲区之前发送"""
+        messages = [ros_codec.dumps({
+            "op": "advertise",
+            "topic": "/move_base/goal",
+            "type": "move_base_msgs/MoveBaseActionGoal"
+        })]
+        # 订阅参数（限频、队列长度、分片、压缩）见 ros_topics_config.json
+        for topic, opts in ros_topic_config.items():
+            messages.append(ros_codec.dumps(ros_topics.subscribe_op(topic, opts)))
+        if self.recorder is not None:
+            for data in messages:
+                self.recorder.write(OUTBOUND, data)
+        self.decoder = ros_codec.RosFrameDecoder()  # 上一个连接没收完的分片作废
+        return messages
+
+    def on_open(self, down_since):
+        if down_since is not None:
+            # 断线期间小车端可能重启过，下一条 /move_base/status 里没有的目标重新发布
+            self.goal_tracker.resync(down_since)
+        main_loop.call_soon_threadsafe(refine_costs)
+
+    def on_message(self, ws, message):
+        if self.recorder is not None:
+            self.recorder.write(INBOUND, message)
+        # 先看 topic，没人关心的消息不做完整解析（二进制 CBOR 帧直接解码）
+        if isinstance(message, str):
+            topic = ros_codec.peek_topic(message)
+            if topic is not None and topic not in ROS_TOPICS:
+                ros_messages_skipped.inc(self.robot_id)
+                return
+        started = ros_decode_seconds.start()
+        try:
+            data = self.decoder.decode(message)
+        except Exception as e:
+            # 坏帧只丢这一条；异常要是抛给 websocket-client 会走 on_error，不能让它影响连接状态
+            ros_decode_errors.inc(self.robot_id)
+            print(f"⚠️ [{self.robot_id}] 丢弃无法解码的 rosbridge 消息: {e}")
+            return
+        finally:
+            ros_decode_seconds.stop(started)
+        if data is None:
+            return
+        ros_messages.inc(self.robot_id, data.get("topic", ""))
+        main_loop.call_soon_threadsafe(self.handle_message, data)
+
+    def on_close(self, code, msg):
+        print(f"🔌 [{self.robot_id}] ROS WebSocket 关闭: {code}, {msg}")
+
+    def on_error(self, error):
+        print(f"❌ [{self.robot_id}] ROS WebSocket 错误: {error}")
+
+    # ---------- 消息处理（事件循环线程） ----------
+
+    def handle_message(self, data):
+        if data.get("op") == "service_response":
+            self._service_done(data.get("id"), data.get("result", False), data.get("values"))
+            return
+        topic = data.get("topic")
+
+        if topic == "/odom":
+            self.rotation.update_yaw(yaw_from_quaternion(data["msg"]["pose"]["pose"]["orientation"]), "odom")
+
+        elif topic == "/amcl_pose":
+            position = data["msg"]["pose"]["pose"]["position"]
+            self.pose = (position["x"], position["y"])
+            self.yaw = yaw_from_quaternion(data["msg"]["pose"]["pose"]["orientation"])
+            self.rotation.update_yaw(self.yaw, "amcl")
+            for client in list(clients.values()):
+                if client.pose_sub is not None and client.robot_id == self.robot_id:
+                    push_pose(client)
+            cov = data["msg"]["pose"]["covariance"]
+            cov_x = cov[0]
+            cov_y = cov[7]
+            #print(cov_x)
+            #print(cov_y)
+            if cov_x < 0.4 and cov_y < 0.4:
+                if not self.amcl_converged:
+                    self.amcl_converged = True
+                    print(f"✅ [{self.robot_id}] AMCL 收教：协方差 x={cov_x:.3f}, y={cov_y:.3f}")
+                    self.broadcast({
                         "type": "amcl_status",
                         "msg": "AMCL 已收教，可开始导航",
                         "data": {},
                         "success": True
                     })
-        else:
-            if amcl_converged:
-                amcl_converged = False
-                print(f"⚠️ AMCL 发散：协方差 x={cov_x:.3f}, y={cov_y:.3f}")
-                cancel_navigation_goal()
-                stop_robot()
-                if current_client_conn:
-                    send_json(current_client_conn, {
+            else:
+                if self.amcl_converged:
+                    self.amcl_converged = False
+                    print(f"⚠️ [{self.robot_id}] AMCL 发散：协方差 x={cov_x:.3f}, y={cov_y:.3f}")
+                    self.cancel_navigation_goal()
+                    self.stop_robot()
+                    self.broadcast({
                         "type": "amcl_lost",
                         "msg": "❌ 导航过程中定位失效，已中断导航",
                         "data": {},
                         "success": False
                     })
 
-    elif data.get("topic") == "/move_base/result":
-        status = data["msg"].get("status", {})
-        code = status.get("status", -1)
-        goal_id = status.get("goal_id", {}).get("id", "")
-
-        if code == 3 and not is_handling:
-            is_handling = True
-            print(f"🎯 到站成功: {goal_id}")
-            if current_client_conn:
-                send_json(current_client_conn, {
-                    "type": "arrived",
-                    "data": {"station": goal_id},
-                    "msg": "已到达目标站点",
-                    "success": True
-                })
-            time.sleep(3)
-            clear_costmaps()
-            is_handling = False
-
-
-def clear_costmaps():
-    ros_ws.send(json.dumps({
-        "op": "call_service",
-        "service": "/move_base/clear_costmaps",
-        "args": {}
-    }))
-    print("🪑 已请求清除代价地图")
-
-
-def on_ros_close(ws, code, msg):
-    print(f"🔌 ROS WebSocket 关闭: {code}, {msg}")
-
-
-def on_ros_error(ws, error):
-    print(f"❌ ROS WebSocket 错误: {error}")
-
-
-def publish_navigation_goal(pose, station_index):
-    global current_station_index
-    current_station_index = station_index
-    now_secs = int(time.time())
-    goal_id = f"goal_{station_index}_{now_secs}"
-
-    goal_msg = {
-        "header": {
-            "seq": 0,
-            "stamp": {"secs": 0, "nsecs": 0},
-            "frame_id": "map"
-        },
-        "goal_id": {
-            "stamp": {"secs": 0, "nsecs": 0},
-            "id": goal_id
-        },
-        "goal": {
-            "target_pose": {
-                "header": {
-                    "frame_id": "map",
-                    "stamp": {"secs": 0, "nsecs": 0}
-                },
-                "pose": pose
-            }
-        }
-    }
+        elif topic == "/move_base/status":
+            self.goal_tracker.on_status_array(data["msg"])
 
-    ros_ws.send(json.dumps({
-        "op": "publish",
-        "topic": "/move_base/goal",
-        "msg": goal_msg
-    }))
-    print(f"📤 已发布 ROS1 导航目标: {goal_msg}")
+        elif topic == "/move_base/feedback":
+            self.goal_tracker.on_feedback(data["msg"])
 
+        elif topic == "/move_base/result":
+            self.goal_tracker.on_result(data["msg"])
+
+    def start(self):
+        if self.client is not None:  # 回放 / 离线调试时没有真实连接
+            self.client.start()
 
-def start_ros_ws():
-    global ros_ws
-    while True:
-        try:
-            ros_ws = websocket.WebSocketApp(
-                "ws://192.168.1.197:9090",
-                on_open=on_ros_open,
-                on_message=on_ros_message,
-                on_close=on_ros_close,
-                on_error=on_ros_error
-            )
-            ros_ws.run_forever(ping_interval=10, ping_timeout=5)
-        except Exception as e:
-            print(f"🔁 ROS WebSocket 自动重连中... 原因: {e}")
-            time.sleep(3)
+
+def recorder_path(path, robot_id, robot_count):
+    """多台小车时每台车一个录制文件：field.rosrec -> field.cart1.rosrec"""
+    if robot_count == 1:
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}.{robot_id}{ext}"
 
 
 # ---------- 主程序 ----------
 
 if __name__ == "__main__":
-    threading.Thread(target=start_tcp_server, daemon=True).start()
-    start_ros_ws()
+    parser = argparse.ArgumentParser(description="ROS 小车 TCP 桥接服务")
+    parser.add_argument("--rosbridge", help="只连这一台小车的 rosbridge WebSocket 地址（不读小车配置文件）")
+    parser.add_argument("--robots", default=ROBOTS_CONFIG_FILE, help="小车配置文件 {robot_id: rosbridge 地址}")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--stations-file", help="从 JSON 文件读取站点，不连 MySQL（离线调试 / 压测用）")
+    parser.add_argument("--costs-file", default=STATION_COSTS_FILE, help="代价矩阵缓存文件，空字符串表示不保存")
+    parser.add_argument("--topics", default=ros_topics.TOPIC_CONFIG_FILE, help="话题订阅参数文件")
+    parser.add_argument("--record", help="把 rosbridge 收发的消息录到这个文件（gzip，文件已存在时另起一个编号文件）")
+    parser.add_argument("--metrics-host", default="127.0.0.1")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, help="Prometheus 指标端口，0 表示不开")
+    parser.add_argument("--metrics-sample", type=int, default=1, help="耗时直方图每 N 次采样一次")
+    args = parser.parse_args()
+    metrics.set_sample_every(args.metrics_sample)
+
+    if args.topics != ros_topics.TOPIC_CONFIG_FILE:
+        ros_topic_config = ros_topics.load_topic_config(args.topics)
+
+    if args.costs_file != STATION_COSTS_FILE:
+        cost_matrix = StationCostMatrix(args.costs_file or None, speed=NAV_SPEED)
+    if args.stations_file:
+        station_mirror = None
+        station_cache = StationCache(lambda: load_stations_file(args.stations_file), ttl=0,
+                                     on_reload=on_stations_loaded)
+
+    robot_urls = {DEFAULT_ROBOT_ID: args.rosbridge} if args.rosbridge else load_robot_config(args.robots)
+    for robot_id, url in robot_urls.items():
+        recorder = None
+        if args.record:
+            path = recorder_path(args.record, robot_id, len(robot_urls))
+            recorder = RosRecorder(path)
+            print(f"⏺️ [{robot_id}] 录制 rosbridge 消息到 {recorder.path}")
+        robots[robot_id] = RobotSession(robot_id, url, recorder)
+
+    try:
+        asyncio.run(start_tcp_server(args.host, args.port, args.metrics_host, args.metrics_port))
+    except KeyboardInterrupt:
+        print("🛑 手动中断")
+    finally:
+        for robot in robots.values():
+            if robot.recorder is not None:
+                robot.recorder.close()
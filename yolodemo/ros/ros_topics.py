@@ -0,0 +1,55 @@
+import json
+import os
+
+import ros_codec
+
+TOPIC_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ros_topics_config.json")
+
+# 配置文件不存在时使用的订阅参数
+DEFAULT_TOPICS = {
+    "/move_base/result": {"type": "move_base_msgs/MoveBaseActionResult", "queue_length": 10},
+    "/amcl_pose": {"type": "geometry_msgs/PoseWithCovarianceStamped", "throttle_rate": 200, "queue_length": 1},
+    "/odom": {"type": "nav_msgs/Odometry", "throttle_rate": 50, "queue_length": 1},
+    "/move_base/status": {"type": "actionlib_msgs/GoalStatusArray", "throttle_rate": 200, "queue_length": 1},
+    "/move_base/feedback": {"type": "move_base_msgs/MoveBaseActionFeedback", "throttle_rate": 500,
+                            "queue_length": 1},
+}
+
+# rosbridge subscribe 支持的参数
+SUBSCRIBE_OPTIONS = ("type", "throttle_rate", "queue_length", "fragment_size", "compression")
+COMPRESSIONS = ("none", "png", "cbor")
+
+
+def load_topic_config(path=TOPIC_CONFIG_FILE):
+    """
+    读取每个话题的订阅参数（throttle_rate 毫秒、queue_length、fragment_size 字节、compression）。
+    没装 cbor2 时 cbor 自动降级成 none。
+    """
+    topics = {topic: dict(opts) for topic, opts in DEFAULT_TOPICS.items()}
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for topic, opts in json.load(f).items():
+                    topics.setdefault(topic, {}).update(opts)
+        except Exception as e:
+            print(f"⚠️ 读取话题配置失败，使用默认值: {e}")
+
+    for topic, opts in topics.items():
+        compression = opts.get("compression", "none")
+        if compression not in COMPRESSIONS:
+            print(f"⚠️ {topic} 不支持的压缩方式 {compression}，改为 none")
+            compression = "none"
+        if compression == "cbor" and ros_codec.cbor2 is None:
+            print(f"⚠️ {topic} 配置了 cbor 压缩，但没有安装 cbor2，改为 none")
+            compression = "none"
+        opts["compression"] = compression
+    return topics
+
+
+def subscribe_op(topic, opts):
+    op = {"op": "subscribe", "topic": topic}
+    for name in SUBSCRIBE_OPTIONS:
+        value = opts.get(name)
+        if value is not None and not (name == "compression" and value == "none"):
+            op[name] = value
+    return op
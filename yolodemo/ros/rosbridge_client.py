@@ -0,0 +1,176 @@
+"""
+会自动重连的 rosbridge 客户端（websocket-client，每个连接一个线程）。
+- 断线后按指数退避 + 随机抖动重连，连上一次就把退避清零
+- send 只把消息放进有界缓冲区就返回，不会阻塞事件循环；带 key 的消息只保留最新一条（比如 /cmd_vel）
+- 每台车一个发送线程负责真正的 ws.send，一台车的网络卡住不影响别的车和客户端
+- 每次连上先发 handshake() 给出的 advertise / subscribe，再按顺序补发缓冲区
+- 只有连接真正关闭（on_close / run_forever 返回）或发送失败才算断线；
+  on_error 也会收到回调里抛出的异常，不能据此判断连接状态
+"""
+import random
+import threading
+import time
+
+import websocket
+
+from outbound_queue import DROP_OLDEST, OutboundQueue
+
+
+class RosbridgeClient:
+    def __init__(self, url, handshake=None, on_open=None, on_message=None, on_close=None, on_error=None,
+                 name="", buffer_size=200, backoff_min=0.25, backoff_max=10.0, jitter=0.5):
+        self.url = url
+        self.name = name
+        self._handshake = handshake  # () -> [消息]，每次连上都重新发
+        self._on_open = on_open  # (down_since)：断线时刻（monotonic），第一次连上时为 None
+        self._on_message = on_message  # (ws, message)
+        self._on_close = on_close  # (code, msg)
+        self._on_error = on_error  # (error)
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)  # 有新消息或连上了，唤醒发送线程
+        self._ws = None
+        self._buffer = OutboundQueue(buffer_size, DROP_OLDEST)
+        self._pending = []  # 发送线程已经取出、还没发完的一批，断线后下次连上先发
+        self.connected = False
+        self._attempt = 0
+        self._disconnected_at = None
+
+        self.connects = 0
+        self.sent = 0
+        self.send_failures = 0
+        self.last_gap = None  # 最近一次断线到重新连上用了多少秒
+
+    # ---------- 发送 ----------
+
+    def send(self, data, key=None):
+        """放进缓冲区由发送线程发出，任何线程都可以调用，不会阻塞"""
+        with self._cond:
+            self._buffer.put(data, key)
+            self._cond.notify()
+
+    def _run_sender(self):
+        while True:
+            with self._cond:
+                while not (self.connected and (self._pending or len(self._buffer))):
+                    self._cond.wait()
+                if not self._pending:
+                    self._pending = self._buffer.pop_batch()
+                batch, ws = self._pending, self._ws
+            done = 0
+            try:
+                for data in batch:
+                    ws.send(data)
+                    done += 1
+            except Exception as e:
+                with self._cond:
+                    del batch[:done]  # 没发出去的留给下一次连接
+                    self.sent += done
+                    self.send_failures += 1
+                    if self._ws is ws:
+                        self._mark_down()
+                print(f"⚠️ [{self.name}] rosbridge 发送失败，等待重连后补发: {e}")
+                try:
+                    ws.close()
+                except Exception:
+                    pass
+                continue
+            with self._cond:
+                self.sent += done
+                if self._pending is batch:
+                    self._pending = []
+
+    def _mark_down(self):
+        if self.connected:
+            self.connected = False
+            self._disconnected_at = time.monotonic()
+
+    # ---------- websocket 回调 ----------
+
+    def _handle_open(self, ws):
+        # 先恢复订阅和 advertise（在 websocket 线程里发，不占锁），之后发送线程才开始补发缓冲区
+        try:
+            for data in (self._handshake() if self._handshake else ()):
+                ws.send(data)
+        except Exception as e:
+            # 刚连上又断了，等下一次重连
+            print(f"⚠️ [{self.name}] 恢复订阅失败: {e}")
+            return
+        with self._cond:
+            replayed = len(self._pending) + len(self._buffer)
+            self._ws = ws
+            self.connected = True
+            self._attempt = 0
+            self.connects += 1
+            down_since, self._disconnected_at = self._disconnected_at, None
+            if down_since is not None and self.connects > 1:
+                self.last_gap = time.monotonic() - down_since
+            self._cond.notify()
+        if self.connects > 1:
+            print(f"✅ [{self.name}] 已重连 rosbridge，断开 {self.last_gap * 1000:.0f}ms，待补发 {replayed} 条")
+        else:
+            print(f"✅ [{self.name}] 已连接 rosbridge")
+            down_since = None
+        if self._on_open:
+            self._on_open(down_since)
+
+    def _handle_close(self, ws, code, msg):
+        with self._lock:
+            self._mark_down()
+        if self._on_close:
+            self._on_close(code, msg)
+
+    def _handle_error(self, ws, error):
+        # 回调里的异常也会走到这里，连接可能还是好的；真断了会紧跟着 on_close
+        if self._on_error:
+            self._on_error(error)
+
+    # ---------- 连接循环 ----------
+
+    def next_delay(self):
+        """指数退避，一半固定一半随机，避免一群小车同时重连"""
+        delay = min(self.backoff_max, self.backoff_min * (2 ** self._attempt))
+        self._attempt += 1
+        return delay * (1 - self.jitter) + random.uniform(0, delay * self.jitter)
+
+    def run(self):
+        while True:
+            try:
+                ws = websocket.WebSocketApp(
+                    self.url,
+                    on_open=self._handle_open,
+                    on_message=self._on_message,
+                    on_close=self._handle_close,
+                    on_error=self._handle_error
+                )
+                ws.run_forever(ping_interval=10, ping_timeout=5)
+            except Exception as e:
+                print(f"❌ [{self.name}] rosbridge 连接异常: {e}")
+            with self._lock:
+                self._mark_down()
+                if self._disconnected_at is None:
+                    self._disconnected_at = time.monotonic()
+            delay = self.next_delay()
+            print(f"🔁 [{self.name}] {delay:.2f} 秒后重连 rosbridge（缓冲 {len(self._buffer)} 条）")
+            time.sleep(delay)
+
+    def start(self):
+        threading.Thread(target=self._run_sender, name=f"rosbridge-send-{self.name}", daemon=True).start()
+        threading.Thread(target=self.run, name=f"rosbridge-{self.name}", daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            buffer = self._buffer.stats()
+        return {
+            "connected": self.connected,
+            "connects": self.connects,
+            "sent": self.sent,
+            "send_failures": self.send_failures,
+            "buffered": buffer["depth"] + len(self._pending),
+            "buffer_dropped": buffer["dropped"],
+            "buffer_coalesced": buffer["coalesced"],
+            "last_gap": None if self.last_gap is None else round(self.last_gap, 3),
+        }
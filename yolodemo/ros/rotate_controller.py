@@ -0,0 +1,155 @@
+import math
+import time
+
+
+def yaw_from_quaternion(q):
+    return math.atan2(2.0 * (q["w"] * q["z"] + q["x"] * q["y"]),
+                      1.0 - 2.0 * (q["y"] * q["y"] + q["z"] * q["z"]))
+
+
+def wrap_angle(rad):
+    return (rad + math.pi) % (2 * math.pi) - math.pi
+
+
+class RotationController:
+    """
+    闭环原地旋转：按里程计（没有时用 AMCL）的航向累计已转角度，到达目标角度就停车。
+    由 ActionScheduler 按 rate_hz 周期调用 _tick，不占用任何线程；
+    收不到航向时按下发的角速度 × 时间累计（开环），航向恢复后从当前航向重新开始累计，
+    中断期间的转角不会被算两次。
+    """
+
+    ODOM_FRESH_SEC = 1.0  # 里程计在这个时间内有更新就不用 AMCL 的航向
+
+    def __init__(self, scheduler, publish_cmd_vel, notify, rate_hz=10,
+                 tolerance_deg=2.0, min_speed=0.1, slowdown_deg=20.0, timeout_factor=2.0, name=""):
+        self._scheduler = scheduler
+        self.name = name  # 多台小车共用一个调度器时区分定时任务
+        self._publish = publish_cmd_vel
+        self._notify = notify
+        self.rate_hz = rate_hz
+        self.tolerance = math.radians(tolerance_deg)
+        self.min_speed = min_speed
+        self.slowdown = math.radians(slowdown_deg)
+        self.timeout_factor = timeout_factor
+
+        # 由 rosbridge 线程写入
+        self.yaw = None
+        self._yaw_time = 0.0
+        self._odom_time = 0.0
+
+        self._action = None
+        self._target = 0.0
+        self._speed = 0.0
+        self._turned = 0.0
+        self._last_yaw = None  # 上一个 tick 的航向，航向中断时为 None
+        self._cmd = 0.0  # 上一个 tick 下发的角速度
+        self._last_tick = 0.0
+        self._start_time = 0.0
+        self._open_loop_duration = 0.0
+        self._last_progress = 0.0
+
+    @property
+    def running(self):
+        return self._action is not None and self._action.active
+
+    def update_yaw(self, yaw, source="odom"):
+        now = time.monotonic()
+        if source == "odom":
+            self._odom_time = now
+        elif now - self._odom_time < self.ODOM_FRESH_SEC:
+            return
+        self.yaw = yaw
+        self._yaw_time = now
+
+    def start(self, angle_deg, angular_speed=0.5):
+        """正角度逆时针，负角度顺时针（右转）"""
+        if angular_speed <= 0:
+            print("❌ 错误：角速度必须为正值")
+            return False
+        if self.running:
+            self.stop(False, "被新的旋转指令取代")
+
+        self._target = math.radians(angle_deg)
+        self._speed = angular_speed
+        self._turned = 0.0
+        self._cmd = 0.0
+        self._start_time = time.monotonic()
+        self._last_tick = self._start_time
+        self._last_progress = self._start_time
+        self._open_loop_duration = abs(self._target) / angular_speed
+        self._last_yaw = self.yaw if self._yaw_fresh() else None
+
+        mode = "闭环" if self._last_yaw is not None else "开环"
+        print(f"🔁 开始{mode}旋转 {angle_deg}°，角速度={angular_speed:.2f} rad/s，"
+              f"预计耗时={self._open_loop_duration:.2f} 秒")
+        self._action = self._scheduler.call_every(1.0 / self.rate_hz, self._tick,
+                                                  key=("rotate", self.name), first_delay=0)
+        return True
+
+    def stop(self, success=True, reason="旋转完成"):
+        if self._action is not None:
+            self._action.cancel()
+            self._action = None
+        self._publish(0.0)
+        turned = round(math.degrees(self._turned), 1)
+        print(f"✅ {reason}，已转 {turned}°，已停止小车" if success else f"⚠️ {reason}，已转 {turned}°，已停止小车")
+        self._notify({
+            "type": "turn_done",
+            "data": {"target": round(math.degrees(self._target), 1), "turned": turned},
+            "msg": reason,
+            "success": success
+        })
+
+    def _yaw_fresh(self):
+        return self.yaw is not None and time.monotonic() - self._yaw_time < self.ODOM_FRESH_SEC
+
+    def _tick(self):
+        now = time.monotonic()
+        elapsed = now - self._start_time
+        dt = now - self._last_tick
+        self._last_tick = now
+
+        if self._yaw_fresh():
+            # 闭环：累计航向变化量，自动处理 ±180° 跳变；刚恢复航向的这一拍只记下起点
+            if self._last_yaw is not None:
+                self._turned += wrap_angle(self.yaw - self._last_yaw)
+            self._last_yaw = self.yaw
+            closed_loop = True
+        else:
+            # 开环：按上一拍下发的角速度累计，不丢掉闭环时已经测到的转角
+            if self._last_yaw is not None:
+                # 刚断：最后一次航向之后到现在闭环什么都没累计到，从那时算起
+                dt = now - self._yaw_time
+            self._turned += self._cmd * dt
+            self._last_yaw = None
+            closed_loop = False
+
+        remaining = self._target - self._turned
+        # 开环估算没法回头修正，越过目标也算转完
+        if abs(remaining) <= self.tolerance or (not closed_loop and remaining * self._target < 0):
+            self.stop(True, "旋转完成" if closed_loop else "旋转完成（开环）")
+            return
+        if elapsed > self._open_loop_duration * self.timeout_factor + 2.0:
+            self.stop(False, "旋转超时")
+            return
+        speed = self._speed
+        if closed_loop and abs(remaining) < self.slowdown:
+            # 接近目标时减速，减少过冲
+            speed = max(self.min_speed, self._speed * abs(remaining) / self.slowdown)
+        angular_z = math.copysign(speed, remaining)
+        self._cmd = angular_z
+
+        self._publish(angular_z)
+
+        if now - self._last_progress >= 0.5:
+            self._last_progress = now
+            self._notify({
+                "type": "turn_progress",
+                "data": {
+                    "target": round(math.degrees(self._target), 1),
+                    "turned": round(math.degrees(self._turned), 1)
+                },
+                "msg": "旋转中",
+                "success": True
+            })
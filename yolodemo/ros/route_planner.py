@@ -0,0 +1,114 @@
+"""
+多站点巡检路线：访问顺序优化（最近邻 + 2-opt）和任务进度。
+代价函数 cost(a, b) 一般来自 StationCostMatrix；start_cost(s) 是机器人当前位置到站点 s 的代价，
+不知道机器人在哪时传 None，路线起点不固定。
+"""
+import itertools
+import time
+
+
+def route_length(order, cost, start_cost=None):
+    total = start_cost(order[0]) if start_cost and order else 0.0
+    for a, b in zip(order, order[1:]):
+        total += cost(a, b)
+    return total
+
+
+def nearest_neighbour(stops, cost, start_cost=None):
+    if not stops:
+        return []
+    if start_cost is not None:
+        first = min(stops, key=start_cost)
+        return _greedy_from(first, stops, cost)
+    # 起点不固定时每个站点都试一次，站点数量很少，开销可以忽略
+    candidates = (_greedy_from(first, stops, cost) for first in stops)
+    return min(candidates, key=lambda order: route_length(order, cost))
+
+
+def _greedy_from(first, stops, cost):
+    order = [first]
+    remaining = set(stops)
+    remaining.discard(first)
+    while remaining:
+        last = order[-1]
+        nxt = min(remaining, key=lambda s: (cost(last, s), s))
+        order.append(nxt)
+        remaining.discard(nxt)
+    return order
+
+
+def two_opt(order, cost, start_cost=None, max_rounds=50):
+    """开放路径的 2-opt：反转 order[i..k]，总长度变短就保留，直到没有改进"""
+    order = list(order)
+    n = len(order)
+    if n < 3:
+        return order
+
+    def link(a, b):
+        if a is None:
+            return start_cost(b) if start_cost else 0.0
+        if b is None:
+            return 0.0  # 路线终点不需要回到起点
+        return cost(a, b)
+
+    for _ in range(max_rounds):
+        improved = False
+        for i, k in itertools.combinations(range(n), 2):
+            before = order[i - 1] if i > 0 else None
+            after = order[k + 1] if k + 1 < n else None
+            delta = (link(before, order[k]) + link(order[i], after)
+                     - link(before, order[i]) - link(order[k], after))
+            if delta < -1e-9:
+                order[i:k + 1] = reversed(order[i:k + 1])
+                improved = True
+        if not improved:
+            break
+    return order
+
+
+def plan_route(stops, cost, start_cost=None):
+    return two_opt(nearest_neighbour(stops, cost, start_cost), cost, start_cost)
+
+
+class Route:
+    """一次巡检任务：按顺序逐站导航，index 指向当前这一站"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, stations, optimized=False, planned_cost=None):
+        self.route_id = f"route_{int(time.time())}_{next(self._ids)}"
+        self.stations = list(stations)
+        self.optimized = optimized
+        self.planned_cost = planned_cost
+        self.index = 0
+        self.started = time.monotonic()
+        self.leg_started = self.started
+        self.leg_times = []
+
+    @property
+    def current(self):
+        return self.stations[self.index] if self.index < len(self.stations) else None
+
+    @property
+    def done(self):
+        return self.index >= len(self.stations)
+
+    def start_leg(self):
+        self.leg_started = time.monotonic()
+
+    def complete_leg(self):
+        self.leg_times.append(round(time.monotonic() - self.leg_started, 1))
+        self.index += 1
+
+    def to_dict(self):
+        return {
+            "route_id": self.route_id,
+            "stations": self.stations,
+            "optimized": self.optimized,
+            "leg": self.index + 1 if not self.done else len(self.stations),
+            "legs": len(self.stations),
+            "station": self.current,
+            "leg_times": self.leg_times,
+            "planned_cost": None if self.planned_cost is None else round(self.planned_cost, 2),
+            "elapsed": round(time.monotonic() - self.started, 1),
+        }
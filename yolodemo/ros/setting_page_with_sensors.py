@@ -38,6 +38,7 @@ class SettingPage(QWidget):
         self.sensor_timer.timeout.connect(self.read_sensors)
 
         self.current_bucket = self.load_last_bucket()
+        self.db = DatabaseHelper()
         self.bucket_buttons = {}
         self.img_path = ""
         self.temperature = ""
@@ -72,8 +73,7 @@ class SettingPage(QWidget):
             self.result_display.append("⚠️ 未拍照，无法保存")
             return
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        db = DatabaseHelper()
-        db.insert_data({
+        self.db.insert_data({
             "bucketNumber": self.current_bucket,
             "temperature": self.temperature,
             "oxygenLevel": self.oxygen_value,
@@ -1,8 +1,10 @@
 import socket
 import threading
-import pymysql
 import json
 
+from db_pool import MySQLPool
+from line_framer import LineFramer
+
 db_config = {
     "host": "172.17.190.165",
     "user": "yangqihe",
@@ -11,14 +13,10 @@ db_config = {
     "port": 3306
 }
 
+db_pool = MySQLPool(db_config, max_size=4, idle_timeout=300)
+
 def fetch_station_data():
-    conn = pymysql.connect(**db_config)
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-    cursor.execute("SELECT * FROM my_station ORDER BY station_order")
-    results = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return results
+    return db_pool.query("SELECT * FROM my_station ORDER BY station_order")
 
 def send_json(conn, obj):
     message = json.dumps(obj, ensure_ascii=False) + "\n"
@@ -38,52 +36,74 @@ def handle_client(conn, addr):
             "success": True
         })
 
+        framer = LineFramer(max_line=4096)
         while True:
-            data = conn.recv(1024)
+            data = conn.recv(65536)
             if not data:
                 break
-            msg = data.decode().strip()
-            print(f"📥 收到指令: {msg}")
+            for line in framer.feed(data):
+                if line is None:
+                    send_json(conn, {
+                        "type": "error",
+                        "msg": "指令过长，已丢弃",
+                        "data": {},
+                        "success": False
+                    })
+                    continue
+                msg = line.decode("utf-8", "replace").strip()
+                if msg:
+                    handle_command(conn, msg)
+    except Exception as e:
+        print(f"❌ 异常: {e}")
+    finally:
+        conn.close()
+        print(f"❎ 客户端断开: {addr}")
 
-            if msg.startswith("cmd:"):
-                index = msg.split(":")[1]
+def handle_command(conn, msg):
+    print(f"📥 收到指令: {msg}")
 
-                # 立即回一个 ack
+    if msg.startswith("cmd:"):
+        index = msg.split(":")[1]
+
+        # 立即回一个 ack
+        send_json(conn, {
+            "type": "cmd_ack",
+            "data": {"station": index},
+            "msg": f"收到跳转指令：{index}",
+            "success": True
+        })
+
+        # 5 秒后模拟到达
+        def simulate_arrival():
+            time.sleep(5)
+            try:
                 send_json(conn, {
-                    "type": "cmd_ack",
+                    "type": "arrived",
                     "data": {"station": index},
-                    "msg": f"收到跳转指令：{index}",
+                    "msg": f"已到达 {index} 号站",
                     "success": True
                 })
+                print(f"✅ 已模拟到达 {index} 号站")
+            except Exception as e:
+                print(f"❌ 发送到达消息失败: {e}")
 
-                # 5 秒后模拟到达
-                def simulate_arrival():
-                    time.sleep(5)
-                    try:
-                        send_json(conn, {
-                            "type": "arrived",
-                            "data": {"station": index},
-                            "msg": f"已到达 {index} 号站",
-                            "success": True
-                        })
-                        print(f"✅ 已模拟到达 {index} 号站")
-                    except Exception as e:
-                        print(f"❌ 发送到达消息失败: {e}")
-
-                threading.Thread(target=simulate_arrival, daemon=True).start()
-
-            else:
-                send_json(conn, {
-                    "type": "error",
-                    "msg": f"未知指令: {msg}",
-                    "data": {},
-                    "success": False
-                })
-    except Exception as e:
-        print(f"❌ 异常: {e}")
-    finally:
-        conn.close()
-        print(f"❎ 客户端断开: {addr}")
+        threading.Thread(target=simulate_arrival, daemon=True).start()
+
+    elif msg == "stats":
+        send_json(conn, {
+            "type": "stats",
+            "data": {"db_pool": db_pool.stats()},
+            "msg": "运行统计",
+            "success": True
+        })
+
+    else:
+        send_json(conn, {
+            "type": "error",
+            "msg": f"未知指令: {msg}",
+            "data": {},
+            "success": False
+        })
 
 def start_server(host='0.0.0.0', port=5000):
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -0,0 +1,128 @@
+import math
+import threading
+import time
+
+
+# ---------- 位姿计算 ----------
+
+def quaternion_from_yaw(deg):
+    rad = math.radians(deg)
+    return {
+        "x": 0.0,
+        "y": 0.0,
+        "z": math.sin(rad / 2),
+        "w": math.cos(rad / 2)
+    }
+
+
+def snap_orientation(z, w):
+    """把站点朝向吸附到 0/90/180/-90 度，偏差太大时保留原始四元数"""
+    yaw_deg = math.degrees(2 * math.atan2(z, w))
+
+    if -30 <= yaw_deg <= 30:
+        return quaternion_from_yaw(0)
+    elif 60 <= yaw_deg <= 120:
+        return quaternion_from_yaw(90)
+    elif yaw_deg >= 150 or yaw_deg <= -150:
+        return quaternion_from_yaw(180)
+    elif -120 <= yaw_deg <= -60:
+        return quaternion_from_yaw(-90)
+    return {"x": 0.0, "y": 0.0, "z": z, "w": w}
+
+
+def build_station_pose(row):
+    return {
+        "position": {
+            "x": row["station_x"],
+            "y": row["station_y"],
+            "z": 0.0
+        },
+        "orientation": snap_orientation(row["station_z"], row["station_w"])
+    }
+
+
+# ---------- 站点缓存 ----------
+
+class StationCache:
+    """
+    my_station 内存缓存。
+    第一次使用时整表加载，之后导航命令直接查内存；超过 ttl 秒后在后台线程刷新，
+    刷新期间继续使用旧数据，数据库变慢或断开都不会卡住 cmd → goal。
+    """
+
+    def __init__(self, loader, ttl=300, on_reload=None):
+        self._loader = loader
+        self.ttl = ttl
+        self._on_reload = on_reload  # (rows)，每次加载完调用，比如重建代价矩阵
+        self._load_lock = threading.Lock()
+        self._rows = []
+        self._poses = {}
+        self._loaded_at = 0.0
+        self._refreshing = False
+
+    @property
+    def loaded(self):
+        return self._loaded_at > 0
+
+    def reload(self):
+        """同步重新加载整张表，返回站点数量"""
+        with self._load_lock:
+            return self._load()
+
+    def _load(self):
+        rows = self._loader()
+        poses = {}
+        for row in rows:
+            poses[int(row["station_order"])] = build_station_pose(row)
+        # 整体替换引用，读线程不需要加锁
+        self._rows = rows
+        self._poses = poses
+        self._loaded_at = time.monotonic()
+        print(f"🗂️ 站点缓存已加载: {len(rows)} 个站点")
+        if self._on_reload is not None:
+            try:
+                self._on_reload(rows)
+            except Exception as e:
+                print(f"⚠️ 站点加载回调失败: {e}")
+        return len(rows)
+
+    def load_if_needed(self):
+        if self.loaded:
+            return
+        with self._load_lock:
+            if not self.loaded:
+                self._load()
+
+    def refresh_async(self):
+        """后台刷新，同一时间只跑一个"""
+        if self._refreshing:
+            return
+        self._refreshing = True
+
+        def worker():
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"❌ 站点缓存刷新失败，继续使用旧数据: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _check_ttl(self):
+        if self.ttl and self.loaded and time.monotonic() - self._loaded_at > self.ttl:
+            self.refresh_async()
+
+    def stations(self):
+        self.load_if_needed()
+        self._check_ttl()
+        return self._rows
+
+    def get_pose(self, index):
+        self.load_if_needed()
+        self._check_ttl()
+        pose = self._poses.get(index)
+        if pose is None:
+            # 可能是新加的站点，后台刷新一次，下次命令就能命中
+            self.refresh_async()
+        return pose
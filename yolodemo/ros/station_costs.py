@@ -0,0 +1,167 @@
+"""
+站点之间的行驶代价矩阵（米）。
+- 站点数据一变就用直线距离重建，保证随时有值可查
+- 之后逐对调用 move_base 的 make_plan 服务，用规划出的路径长度替换直线距离
+- 结果连同站点指纹一起存到磁盘，重启后站点没变就直接用，不用重新规划
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+
+
+def stations_fingerprint(rows):
+    """只取影响路径的字段，站点名改了不需要重新规划"""
+    key = sorted((int(r["station_order"]), float(r["station_x"]), float(r["station_y"])) for r in rows)
+    return hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()
+
+
+def euclidean(a, b):
+    return math.hypot(float(b["station_x"]) - float(a["station_x"]), float(b["station_y"]) - float(a["station_y"]))
+
+
+def path_length(poses):
+    """nav_msgs/Path 的 poses 累加长度"""
+    total = 0.0
+    last = None
+    for pose in poses:
+        pos = pose["pose"]["position"]
+        if last is not None:
+            total += math.hypot(pos["x"] - last["x"], pos["y"] - last["y"])
+        last = pos
+    return total
+
+
+class StationCostMatrix:
+    """
+    costs[(a, b)] = [代价, 来源]，来源是 "euclid"、"plan"，或者 "noplan"（规划失败，保留直线距离）。
+    rebuild 可能在加载站点的线程里调用，refine 的回调在事件循环里，内部加锁。
+    """
+
+    def __init__(self, path, speed=0.3, save_every=20):
+        self.path = path
+        self.speed = speed  # 估算 ETA 用的平均速度（米/秒）
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._rows = {}  # station_order -> row
+        self._costs = {}
+        self.fingerprint = None
+        self.generation = 0  # 每次站点变化加一，进行中的规划发现代数变了就放弃
+        self._unsaved = 0
+        self._load_file()
+
+    # ---------- 重建 / 持久化 ----------
+
+    def rebuild(self, rows):
+        """站点数据加载后调用；站点位置没变时什么都不做。返回是否重建"""
+        fingerprint = stations_fingerprint(rows)
+        with self._lock:
+            if fingerprint == self.fingerprint and self._rows:
+                return False
+            old_costs = self._costs if fingerprint == self.fingerprint else {}
+            self._rows = {int(r["station_order"]): r for r in rows}
+            self._costs = {}
+            for a, row_a in self._rows.items():
+                for b, row_b in self._rows.items():
+                    if a != b:
+                        self._costs[(a, b)] = old_costs.get((a, b)) or [euclidean(row_a, row_b), "euclid"]
+            self.fingerprint = fingerprint
+            self.generation += 1
+        print(f"🧮 代价矩阵已重建: {len(rows)} 个站点，{self.pending_count()} 对待规划")
+        self.save()
+        return True
+
+    def _load_file(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.fingerprint = data["fingerprint"]
+            self._costs = {tuple(map(int, key.split(","))): value for key, value in data["costs"].items()}
+            print(f"🧮 已读取代价矩阵缓存: {len(self._costs)} 对")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ 代价矩阵缓存无效，重新计算: {e}")
+            self.fingerprint = None
+            self._costs = {}
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "fingerprint": self.fingerprint,
+                "costs": {f"{a},{b}": value for (a, b), value in self._costs.items()}
+            }
+            self._unsaved = 0
+        with self._save_lock:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+
+    # ---------- 查询 ----------
+
+    def cost(self, a, b):
+        if a == b:
+            return 0.0 if a in self._rows else None
+        value = self._costs.get((a, b))
+        return None if value is None else value[0]
+
+    def eta(self, a, b):
+        cost = self.cost(a, b)
+        return None if cost is None or not self.speed else cost / self.speed
+
+    def cost_from(self, x, y, b):
+        """从任意位置到站点的直线距离（机器人不在站点上时用）"""
+        row = self._rows.get(b)
+        if row is None:
+            return None
+        return math.hypot(float(row["station_x"]) - x, float(row["station_y"]) - y)
+
+    def stations(self):
+        return sorted(self._rows)
+
+    def source(self, a, b):
+        value = self._costs.get((a, b))
+        return None if value is None else value[1]
+
+    def matrix(self):
+        """给客户端的完整矩阵：{"stations": [...], "costs": [[...]], "planned": 已规划对数, ...}"""
+        order = self.stations()
+        return {
+            "stations": order,
+            "costs": [[round(self.cost(a, b), 2) for b in order] for a in order],
+            "planned": sum(1 for value in self._costs.values() if value[1] == "plan"),
+            "pending": self.pending_count(),
+            "total": len(self._costs)
+        }
+
+    def pending_count(self):
+        return sum(1 for value in self._costs.values() if value[1] == "euclid")
+
+    # ---------- make_plan 细化 ----------
+
+    def next_pending(self):
+        """下一对还没规划过的站点 (a, b, row_a, row_b, generation)，a < b，结果两个方向共用"""
+        with self._lock:
+            for (a, b), value in self._costs.items():
+                if a < b and value[1] == "euclid":
+                    return a, b, self._rows[a], self._rows[b], self.generation
+        return None
+
+    def update(self, a, b, cost, generation):
+        """cost 为 None 表示规划不出路径，保留直线距离，之后不再重试"""
+        with self._lock:
+            if generation != self.generation or (a, b) not in self._costs:
+                return False
+            value = [cost, "plan"] if cost is not None else [self._costs[(a, b)][0], "noplan"]
+            self._costs[(a, b)] = value
+            self._costs[(b, a)] = list(value)
+            self._unsaved += 1
+            save = self._unsaved >= self.save_every
+        if save:
+            self.save()
+        return True
@@ -0,0 +1,165 @@
+"""
+my_station 的本地 SQLite 副本。
+桥接服务启动和查站点都只读本地文件，MySQL 连不上也能继续导航；
+后台线程定期用 CHECKSUM TABLE 看远端有没有变化，有变化才拉整表，按 station_order 增量更新。
+"""
+import datetime
+import decimal
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def _plain(value):
+    """pymysql 返回的 Decimal / datetime 转成能存 JSON 的类型"""
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def rows_checksum(rows):
+    return hashlib.sha1(json.dumps(rows, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class StationMirror:
+    """
+    - fetch_rows(): 从 MySQL 读整张 my_station
+    - fetch_checksum(): 返回远端表的校验值（CHECKSUM TABLE），拿不到时返回 None，退化成比较整表内容
+    - on_change(): 本地副本有更新时调用，比如让 StationCache 重新读
+    行存成 JSON，MySQL 表加了列也不用改这里。
+    """
+
+    def __init__(self, path, fetch_rows, fetch_checksum=None, on_change=None):
+        self.path = path
+        self._fetch_rows = fetch_rows
+        self._fetch_checksum = fetch_checksum
+        self.on_change = on_change
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._table_ready = False
+
+        self.last_sync = None  # 最近一次成功同步的时间（time.time）
+        self.last_error = None
+        self.syncs = 0
+        self.changes = 0
+
+    def _connect(self):
+        # 第一次用到时才建文件，--stations-file 等不用副本的场景不会留下空库
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._table_ready:
+            conn.execute("PRAGMA journal_mode=WAL")  # 同步写入时读不会被挡住，设置一次就会留在文件里
+            self._ensure_table(conn)
+            self._table_ready = True
+        return conn
+
+    @staticmethod
+    def _ensure_table(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS my_station (
+                station_order INTEGER PRIMARY KEY,
+                row TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE TABLE IF NOT EXISTS mirror_meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.commit()
+
+    def _meta(self, conn, key):
+        row = conn.execute("SELECT value FROM mirror_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    # ---------- 读 ----------
+
+    def rows(self):
+        """
+        按 station_order 排好的站点列表。本地从来没同步过时先同步一次（这时才会等 MySQL）。
+        """
+        conn = self._connect()
+        try:
+            synced = self._meta(conn, "checksum") is not None
+            if synced:
+                return [json.loads(row) for (row,) in
+                        conn.execute("SELECT row FROM my_station ORDER BY station_order")]
+        finally:
+            conn.close()
+        self.sync()
+        return self.rows()
+
+    # ---------- 同步 ----------
+
+    def sync(self):
+        """和 MySQL 对一次，返回本地变化的行数；MySQL 出错时抛异常，本地数据不动"""
+        with self._sync_lock:
+            try:
+                changed = self._sync()
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            self.last_error = None
+            self.last_sync = time.time()
+            self.syncs += 1
+        if changed:
+            self.changes += changed
+            print(f"🔄 站点本地副本已更新: {changed} 行")
+            if self.on_change is not None:
+                self.on_change()
+        return changed
+
+    def _sync(self):
+        remote_checksum = self._fetch_checksum() if self._fetch_checksum else None
+        conn = self._connect()
+        try:
+            local_checksum = self._meta(conn, "checksum")
+            if remote_checksum is not None and str(remote_checksum) == local_checksum:
+                return 0
+
+            rows = [{k: _plain(v) for k, v in row.items()} for row in self._fetch_rows()]
+            checksum = str(remote_checksum) if remote_checksum is not None else rows_checksum(rows)
+            if checksum == local_checksum:
+                return 0
+
+            local = dict(conn.execute("SELECT station_order, row FROM my_station"))
+            remote = {int(row["station_order"]): json.dumps(row, ensure_ascii=False, sort_keys=True)
+                      for row in rows}
+            upserts = [(order, text) for order, text in remote.items() if local.get(order) != text]
+            deletes = [(order,) for order in local if order not in remote]
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO my_station (station_order, row) VALUES (?, ?)", upserts)
+                conn.executemany("DELETE FROM my_station WHERE station_order = ?", deletes)
+                conn.execute("INSERT OR REPLACE INTO mirror_meta (key, value) VALUES ('checksum', ?)", (checksum,))
+            # 第一次同步时哪怕表是空的也算变化，让缓存去读
+            return len(upserts) + len(deletes) or (1 if local_checksum is None else 0)
+        finally:
+            conn.close()
+
+    def start(self, interval=30.0):
+        """后台线程：立即同步一次，之后每 interval 秒一次"""
+        if self._thread is not None:
+            return
+
+        def worker():
+            while not self._stop.is_set():
+                try:
+                    self.sync()
+                except Exception as e:
+                    print(f"⚠️ 站点同步失败，继续使用本地副本: {e}")
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=worker, name="station-mirror", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "last_sync": self.last_sync,
+            "last_error": self.last_error,
+            "syncs": self.syncs,
+            "changes": self.changes,
+        }
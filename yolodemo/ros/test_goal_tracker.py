@@ -0,0 +1,107 @@
+"""
+GoalTracker 的单元测试，不需要 rosbridge 和事件循环：
+
+    python -m pytest -q test_goal_tracker.py
+"""
+import time
+
+from goal_tracker import ACTIVE, GoalTracker
+
+
+class StubScheduler:
+    """只记录定时任务，由测试手动触发"""
+
+    def __init__(self):
+        self.pending = {}
+
+    def call_later(self, delay, fn, *args, key=None):
+        self.pending[key] = (fn, args)
+
+    def cancel(self, key):
+        self.pending.pop(key, None)
+
+    def fire(self, key):
+        fn, args = self.pending.pop(key)
+        fn(*args)
+
+
+def make_tracker():
+    scheduler = StubScheduler()
+    published, canceled, notified = [], [], []
+    tracker = GoalTracker(scheduler,
+                          publish_goal=lambda pose, station, goal_id: published.append((station, goal_id)),
+                          cancel_goal=canceled.append,
+                          notify=notified.append,
+                          max_retries=1)
+    return tracker, scheduler, published, canceled, notified
+
+
+POSE_A = {"position": {"x": 1.0, "y": 0.0, "z": 0.0}, "orientation": {"x": 0, "y": 0, "z": 0, "w": 1}}
+POSE_B = {"position": {"x": 2.0, "y": 0.0, "z": 0.0}, "orientation": {"x": 0, "y": 0, "z": 0, "w": 1}}
+
+
+def test_replaced_goal_leaves_flight_and_timer():
+    tracker, scheduler, published, _, notified = make_tracker()
+    a = tracker.start(1, POSE_A)
+    b = tracker.start(2, POSE_B)
+
+    assert [g["goal_id"] for g in tracker.active_goals()] == [b.goal_id]
+    assert ("goal_timeout", "", a.goal_id) not in scheduler.pending
+    assert any(m["type"] == "goal_canceled" and m["data"]["goal_id"] == a.goal_id for m in notified)
+    assert published == [(1, a.goal_id), (2, b.goal_id)]
+
+
+def test_stale_timeout_of_replaced_goal_does_not_republish():
+    tracker, scheduler, published, canceled, _ = make_tracker()
+    a = tracker.start(1, POSE_A)
+    b = tracker.start(2, POSE_B)
+
+    # A 的超时已经在排队时被替换（比如重连期间 PREEMPTED 结果丢了）
+    tracker._on_timeout(a.goal_id)
+
+    assert published == [(1, a.goal_id), (2, b.goal_id)]
+    assert canceled == []
+    assert [g["goal_id"] for g in tracker.active_goals()] == [b.goal_id]
+
+
+def test_timeout_of_current_goal_retries():
+    tracker, scheduler, published, canceled, _ = make_tracker()
+    a = tracker.start(1, POSE_A)
+    scheduler.fire(("goal_timeout", "", a.goal_id))
+
+    assert canceled == [a.goal_id]
+    assert len(published) == 2 and published[1][0] == 1
+    assert tracker.active_goals()[0]["attempt"] == 2
+
+
+def test_replaced_goal_preempted_result_is_ignored():
+    tracker, _, published, _, notified = make_tracker()
+    a = tracker.start(1, POSE_A)
+    b = tracker.start(2, POSE_B)
+    tracker.on_status_array({"status_list": [{"goal_id": {"id": b.goal_id}, "status": ACTIVE}]})
+    count = len(notified)
+
+    tracker.on_result({"status": {"goal_id": {"id": a.goal_id}, "status": 2, "text": ""}})
+
+    assert len(notified) == count
+    assert [g["goal_id"] for g in tracker.active_goals()] == [b.goal_id]
+
+
+def test_resync_does_not_republish_replaced_goal():
+    tracker, _, published, _, _ = make_tracker()
+    a = tracker.start(1, POSE_A)
+    # 链路断开期间操作员发了新目标 B，重连后第一条 status 里只有 B
+    tracker.resync(time.monotonic() + 1)
+    b = tracker.start(2, POSE_B)
+    tracker.on_status_array({"status_list": [{"goal_id": {"id": b.goal_id}, "status": ACTIVE}]})
+
+    assert published == [(1, a.goal_id), (2, b.goal_id)]
+
+
+def test_resync_republishes_goal_move_base_forgot():
+    tracker, _, published, _, _ = make_tracker()
+    a = tracker.start(1, POSE_A)
+    tracker.resync(time.monotonic() + 1)
+    tracker.on_status_array({"status_list": []})
+
+    assert published == [(1, a.goal_id), (1, a.goal_id)]
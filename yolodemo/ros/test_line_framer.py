@@ -0,0 +1,36 @@
+"""
+LineFramer 的单元测试：
+
+    python -m pytest -q test_line_framer.py
+"""
+from line_framer import LineFramer
+
+
+def feed_all(framer, chunks):
+    lines = []
+    for chunk in chunks:
+        lines.extend(framer.feed(chunk))
+    return lines
+
+
+def test_split_and_batched_lines():
+    framer = LineFramer()
+    assert feed_all(framer, [b"cmd:3\ncmd:", b"4\r", b"\n"]) == [b"cmd:3", b"cmd:4"]
+    assert framer.pending == 0
+
+
+def test_max_line_crlf_in_one_read():
+    framer = LineFramer(max_line=8)
+    assert framer.feed(b"A" * 8 + b"\r\n") == [b"A" * 8]
+
+
+def test_max_line_crlf_split_across_reads():
+    # \r 和 \n 分两次到达时，限制和一次读到时一样
+    framer = LineFramer(max_line=8)
+    assert feed_all(framer, [b"A" * 8 + b"\r", b"\nnext\n"]) == [b"A" * 8, b"next"]
+
+
+def test_too_long_line_is_reported_once_and_discarded():
+    framer = LineFramer(max_line=8)
+    assert feed_all(framer, [b"A" * 9, b"BBB", b"\nok\n"]) == [None, b"ok"]
+    assert feed_all(framer, [b"A" * 8 + b"\rX", b"\n"]) == [None]
@@ -0,0 +1,77 @@
+"""
+RotationController 的单元测试：用假时钟模拟小车按下发的角速度转动，里程计中途断一段。
+
+    python -m pytest -q test_rotate_controller.py
+"""
+import math
+
+import rotate_controller
+from rotate_controller import RotationController
+
+
+class FakeAction:
+    def __init__(self):
+        self.active = True
+
+    def cancel(self):
+        self.active = False
+
+
+class StubScheduler:
+    def __init__(self):
+        self.tick = None
+
+    def call_every(self, interval, fn, *args, key=None, first_delay=None):
+        self.tick = fn
+        return FakeAction()
+
+
+def simulate(monkeypatch, angle_deg, odom_gap=None, step=0.05, odom_hz=20):
+    """返回 (实际转过的角度°, 控制器报告的角度°, 结束消息)"""
+    clock = [100.0]
+    monkeypatch.setattr(rotate_controller.time, "monotonic", lambda: clock[0])
+    cmd = [0.0]
+    done = []
+    scheduler = StubScheduler()
+    controller = RotationController(scheduler, lambda z: cmd.__setitem__(0, z),
+                                    lambda m: done.append(m) if m["type"] == "turn_done" else None)
+    heading = 0.0
+    controller.update_yaw(heading)
+    controller.start(angle_deg, angular_speed=0.5)
+
+    t = 0.0
+    tick_every = round(1.0 / controller.rate_hz / step)
+    odom_every = round(1.0 / odom_hz / step)
+    for i in range(int(30 / step)):
+        if i % tick_every == 0:
+            scheduler.tick()
+            if done:
+                break
+        heading += cmd[0] * step
+        t += step
+        clock[0] += step
+        in_gap = odom_gap is not None and odom_gap[0] <= t < odom_gap[1]
+        if i % odom_every == 0 and not in_gap:
+            controller.update_yaw(rotate_controller.wrap_angle(heading))
+    assert done, "旋转没有结束"
+    return math.degrees(heading), done[0]["data"]["turned"], done[0]["msg"]
+
+
+def test_closed_loop_reaches_target(monkeypatch):
+    real, turned, msg = simulate(monkeypatch, 90)
+    assert msg == "旋转完成"
+    assert abs(real - 90) <= 3
+    assert abs(turned - real) <= 1
+
+
+def test_odom_gap_does_not_double_count(monkeypatch):
+    # 转到一半里程计断 2 秒（超过 ODOM_FRESH_SEC），恢复后仍然停在真实的 90°
+    real, turned, msg = simulate(monkeypatch, 90, odom_gap=(0.6, 2.6))
+    assert abs(real - 90) <= 5, f"实际转了 {real:.1f}°，报告 {turned}°"
+    assert abs(turned - real) <= 5
+
+
+def test_odom_gap_until_end_finishes_open_loop(monkeypatch):
+    real, turned, msg = simulate(monkeypatch, -90, odom_gap=(0.6, 60))
+    assert msg == "旋转完成（开环）"
+    assert abs(real + 90) <= 5